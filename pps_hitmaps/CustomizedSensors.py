@@ -20,44 +20,45 @@
 # 3. This notice may not be removed or altered from any source distribution.
 #############################################################################
 
-from __future__ import annotations
-
-from .Sensor import Sensor
-from .SensorPad import SensorPad
 
+from __future__ import annotations
 
-class SimpleETLSensor(Sensor):
-    def __init__(self, shifts:list = []):
-        Sensor.__init__(self, shifts=shifts)
-
-        PadSize = 1.3
-        SensorSize = PadSize*16
+from fractions import Fraction
 
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
+from .Sensor import Sensor
+from .PadLayout import PadColumn
+from .PadLayout import PadLayout
 
-        for x in range(16):
-            minX = -SensorSize/2 + x*PadSize
-            maxX = -SensorSize/2 + (x+1)*PadSize
-            for y in range(16):
-                minY = -SensorSize/2 + y*PadSize
-                maxY = -SensorSize/2 + (y+1)*PadSize
-                self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=0)]
+import numpy
 
-        self.numPads = len(self.padVec)
 
+class _LeftRightSensor(Sensor):
+    """Sensor with the pads split in the left and right categories, by the side of the sensor center they are on"""
     def _getAllPadCategories(self):
         return ["left", "right"]
 
+    def _getPadCategories(self):
+        return numpy.where(self.padGeometry()["maxX"] < 0, "left", "right").tolist()
+
     def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
+        if self._padVec is None:
+            maxX = self._padTable.maxX[padID]
+        else:
+            maxX = self.padVec[padID].maxX
+        if maxX < 0:
             return "left"
         else:
             return "right"
 
-class RealisticETLSensor(Sensor):
+class SimpleETLSensor(_LeftRightSensor):
+    def __init__(self, shifts:list = []):
+        Sensor.__init__(self, shifts=shifts)
+
+        PadSize = 1.3
+
+        self.setLayout(PadLayout([PadColumn()]*16, padSize=PadSize, padSpacing=0, guardRing=0))
+
+class RealisticETLSensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the pads, neglecting the interpad distance
@@ -70,35 +71,9 @@ class RealisticETLSensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(16):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            for y in range(16):
-                minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
+        self.setLayout(PadLayout([PadColumn()]*16, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
-
-class PPSHybrid1Sensor(Sensor):
+class PPSHybrid1Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -111,43 +86,10 @@ class PPSHybrid1Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(15):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 14:
-                maxX = SensitiveEdge + (x+2)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(32):
-                    minY = SensitiveEdge + y*PadSize/2 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/2 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(16):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
+        columns = [PadColumn(rows=2)] + [PadColumn()]*13 + [PadColumn(width=2)]
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-class PPSHybrid2Sensor(Sensor):
+class PPSHybrid2Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -160,43 +102,10 @@ class PPSHybrid2Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(14):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 13:
-                maxX = SensitiveEdge + (x+3)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(48):
-                    minY = SensitiveEdge + y*PadSize/3 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/3 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(16):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
+        columns = [PadColumn(rows=3)] + [PadColumn()]*12 + [PadColumn(width=3)]
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-class PPSHybrid3Sensor(Sensor):
+class PPSHybrid3Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -209,43 +118,10 @@ class PPSHybrid3Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(13):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 12:
-                maxX = SensitiveEdge + (x+4)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(64):
-                    minY = SensitiveEdge + y*PadSize/4 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/4 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(16):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
+        columns = [PadColumn(rows=4)] + [PadColumn()]*11 + [PadColumn(width=4)]
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
-
-class PPSHybrid4Sensor(Sensor):
+class PPSHybrid4Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -258,46 +134,10 @@ class PPSHybrid4Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(13):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 11:
-                maxX = SensitiveEdge + (x+2)*PadSize - PadSpacing/2
-            if x == 12:
-                minX = SensitiveEdge + (x+1)*PadSize + PadSpacing/2
-                maxX = SensitiveEdge + (x+4)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(64):
-                    minY = SensitiveEdge + y*PadSize/4 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/4 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(16):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
+        columns = [PadColumn(rows=4)] + [PadColumn()]*10 + [PadColumn(width=2), PadColumn(width=3)]
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-class PPSHybrid5Sensor(Sensor):
+class PPSHybrid5Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -310,46 +150,10 @@ class PPSHybrid5Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(13):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 12:
-                maxX = SensitiveEdge + (x+4)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(32):
-                    minY = SensitiveEdge + y*PadSize/2 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/2 - PadSpacing/2
-                    for xi in range(2):
-                        minX = SensitiveEdge + xi*PadSize/2 + PadSpacing/2
-                        maxX = SensitiveEdge + (xi+1)*PadSize/2 - PadSpacing/2
-                        self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(16):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
+        columns = [PadColumn(rows=2, subColumns=2)] + [PadColumn()]*11 + [PadColumn(width=4)]
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-class PPSHybrid6Sensor(Sensor):
+class PPSHybrid6Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -362,49 +166,10 @@ class PPSHybrid6Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(13):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 11:
-                maxX = SensitiveEdge + (x+2)*PadSize - PadSpacing/2
-            if x == 12:
-                minX = SensitiveEdge + (x+1)*PadSize + PadSpacing/2
-                maxX = SensitiveEdge + (x+4)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(32):
-                    minY = SensitiveEdge + y*PadSize/2 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/2 - PadSpacing/2
-                    for xi in range(2):
-                        minX = SensitiveEdge + xi*PadSize/2 + PadSpacing/2
-                        maxX = SensitiveEdge + (xi+1)*PadSize/2 - PadSpacing/2
-                        self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(16):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
+        columns = [PadColumn(rows=2, subColumns=2)] + [PadColumn()]*10 + [PadColumn(width=2), PadColumn(width=3)]
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-class PPSHybrid7Sensor(Sensor):
+class PPSHybrid7Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -417,49 +182,10 @@ class PPSHybrid7Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(13):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 10:
-                maxX = SensitiveEdge + (x+2)*PadSize - PadSpacing/2
-            if x == 11:
-                minX = SensitiveEdge + (x+1)*PadSize + PadSpacing/2
-                maxX = SensitiveEdge + (x+3)*PadSize - PadSpacing/2
-            if x == 12:
-                minX = SensitiveEdge + (x+2)*PadSize + PadSpacing/2
-                maxX = SensitiveEdge + (x+4)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(64):
-                    minY = SensitiveEdge + y*PadSize/4 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/4 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(16):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
+        columns = [PadColumn(rows=4)] + [PadColumn()]*9 + [PadColumn(width=2)]*3
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
-
-class PPSHybrid8Sensor(Sensor):
+class PPSHybrid8Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -472,52 +198,10 @@ class PPSHybrid8Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(13):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 10:
-                maxX = SensitiveEdge + (x+2)*PadSize - PadSpacing/2
-            if x == 11:
-                minX = SensitiveEdge + (x+1)*PadSize + PadSpacing/2
-                maxX = SensitiveEdge + (x+3)*PadSize - PadSpacing/2
-            if x == 12:
-                minX = SensitiveEdge + (x+2)*PadSize + PadSpacing/2
-                maxX = SensitiveEdge + (x+4)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(32):
-                    minY = SensitiveEdge + y*PadSize/2 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/2 - PadSpacing/2
-                    for xi in range(2):
-                        minX = SensitiveEdge + xi*PadSize/2 + PadSpacing/2
-                        maxX = SensitiveEdge + (xi+1)*PadSize/2 - PadSpacing/2
-                        self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(16):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
+        columns = [PadColumn(rows=2, subColumns=2)] + [PadColumn()]*9 + [PadColumn(width=2)]*3
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
-
-class PPSHybrid9Sensor(Sensor):
+class PPSHybrid9Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -530,46 +214,10 @@ class PPSHybrid9Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(14):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 12:
-                maxX = SensitiveEdge + (x+2)*PadSize - PadSpacing/2
-            if x == 13:
-                minX = SensitiveEdge + (x+1)*PadSize + PadSpacing/2
-                maxX = SensitiveEdge + (x+3)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(48):
-                    minY = SensitiveEdge + y*PadSize/3 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/3 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(16):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
+        columns = [PadColumn(rows=3)] + [PadColumn()]*11 + [PadColumn(width=2)]*2
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-class PPSHybrid10Sensor(Sensor):
+class PPSHybrid10Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -582,46 +230,10 @@ class PPSHybrid10Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(14):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 13:
-                maxX = SensitiveEdge + (x+3)*PadSize - PadSpacing/2
-            if x == 0:
-                minX = SensitiveEdge + PadSpacing/2
-                maxX = SensitiveEdge + (x+1)*PadSize/2 - PadSpacing/2
-                for y in range(32):
-                    minY = SensitiveEdge + y*PadSize/2 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/2 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-                minX = SensitiveEdge + PadSize/2 + PadSpacing/2
-                maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            for y in range(16):
-                minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
+        columns = [PadColumn(width=Fraction(1, 2), rows=2), PadColumn(width=Fraction(1, 2))] + [PadColumn()]*12 + [PadColumn(width=3)]
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
-
-class PPSHybrid11Sensor(Sensor):
+class PPSHybrid11Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.1, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -634,49 +246,10 @@ class PPSHybrid11Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(14):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 12:
-                maxX = SensitiveEdge + (x+2)*PadSize - PadSpacing/2
-            if x == 13:
-                minX = SensitiveEdge + (x+1)*PadSize + PadSpacing/2
-                maxX = SensitiveEdge + (x+3)*PadSize - PadSpacing/2
-            if x == 0:
-                minX = SensitiveEdge + PadSpacing/2
-                maxX = SensitiveEdge + (x+1)*PadSize/2 - PadSpacing/2
-                for y in range(32):
-                    minY = SensitiveEdge + y*PadSize/2 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/2 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-                minX = SensitiveEdge + PadSize/2 + PadSpacing/2
-                maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            for y in range(16):
-                minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
+        columns = [PadColumn(width=Fraction(1, 2), rows=2), PadColumn(width=Fraction(1, 2))] + [PadColumn()]*11 + [PadColumn(width=2)]*2
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
-
-class TIProduction1Sensor(Sensor):
+class TIProduction1Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.03, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -689,41 +262,10 @@ class TIProduction1Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*3 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*1.5
-
-        for x in range(3):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(12):
-                    minY = SensitiveEdge + y*PadSize/4 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/4 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(3):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
+        columns = [PadColumn(rows=4)] + [PadColumn()]*2
+        self.setLayout(PadLayout(columns, height=3, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
-
-class TIProduction2Sensor(Sensor):
+class TIProduction2Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.03, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -736,43 +278,10 @@ class TIProduction2Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSizeX = PadSize*2 + 2*GuardRing - PadSpacing
-        SensorSizeY = PadSize*1 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSizeX/2
-        self.maxX = SensorSizeX/2
-        self.minY =-SensorSizeY/2
-        self.maxY = SensorSizeY/2
-
-        SensitiveEdgeX = -PadSize
-        SensitiveEdgeY = -PadSize*0.5
-
-        for x in range(2):
-            minX = SensitiveEdgeX + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdgeX + (x+1)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(4):
-                    minY = SensitiveEdgeY + y*PadSize/4 + PadSpacing/2
-                    maxY = SensitiveEdgeY + (y+1)*PadSize/4 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                for y in range(1):
-                    minY = SensitiveEdgeY + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdgeY + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
+        columns = [PadColumn(rows=4), PadColumn()]
+        self.setLayout(PadLayout(columns, height=1, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
-
-class TIProduction3Sensor(Sensor):
+class TIProduction3Sensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, PadSpacing = 0.03, GuardRing = 0.3):
         """
         PadSize - design size of the square pads, neglecting the interpad distance
@@ -785,43 +294,10 @@ class TIProduction3Sensor(Sensor):
         self.padSpacing = PadSpacing
         self.guardRing = GuardRing
 
-        SensorSize = PadSize*5 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*2.5
-
-        for x in range(4):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            if x == 0:
-                for y in range(20):
-                    minY = SensitiveEdge + y*PadSize/4 + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize/4 - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-            else:
-                if x == 3:
-                    maxX = SensitiveEdge + (x+2)*PadSize - PadSpacing/2
-                for y in range(5):
-                    minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                    maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                    self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
+        columns = [PadColumn(rows=4)] + [PadColumn()]*2 + [PadColumn(width=2)]
+        self.setLayout(PadLayout(columns, height=5, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-class RectangularPadSensor(Sensor):
+class RectangularPadSensor(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, SmallPadSize = 1.3/3, PadSpacing = 0.1, GuardRing = 0.3, NumSmallerCols = 3):
         """
         PadSize - design size of the pads, neglecting the interpad distance
@@ -838,46 +314,11 @@ class RectangularPadSensor(Sensor):
         self.guardRing = GuardRing
         self.numSmallerCols = NumSmallerCols
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(16):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            for y in range(16):
-                extra_y = PadSpacing/2
-                usePadSize = PadSize - PadSpacing
-                if x < NumSmallerCols:
-                    extra_y = PadSpacing/2 + (PadSize - SmallPadSize)/2
-                    usePadSize = SmallPadSize
-
-                center_y = SensitiveEdge + (y + 0.5)*PadSize
+        smallColumn = PadColumn(padHeight=SmallPadSize, extraY=PadSpacing/2 + (PadSize - SmallPadSize)/2)
+        columns = [smallColumn]*NumSmallerCols + [PadColumn(padHeight=PadSize - PadSpacing)]*(16 - NumSmallerCols)
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing))
 
-                minY = center_y - usePadSize/2
-                maxY = center_y + usePadSize/2
-
-                #minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                #maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra_x=PadSpacing/2, extra_y=extra_y)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
-
-class RectangularPadSensorVertical(Sensor):
+class RectangularPadSensorVertical(_LeftRightSensor):
     def __init__(self, shifts:list = [], PadSize = 1.3, SmallPadSize = 1.3/3, PadSpacing = 0.1, GuardRing = 0.3, NumSmallerCols = 3):
         """
         PadSize - design size of the pads, neglecting the interpad distance
@@ -894,41 +335,7 @@ class RectangularPadSensorVertical(Sensor):
         self.guardRing = GuardRing
         self.numSmallerCols = NumSmallerCols
 
-        SensorSize = PadSize*16 + 2*GuardRing - PadSpacing
-
-        self.minX =-SensorSize/2
-        self.maxX = SensorSize/2
-        self.minY =-SensorSize/2
-        self.maxY = SensorSize/2
-
-        SensitiveEdge = -PadSize*8
-
-        for x in range(16):
-            minX = SensitiveEdge + x*PadSize + PadSpacing/2
-            maxX = SensitiveEdge + (x+1)*PadSize - PadSpacing/2
-            for y in range(16):
-                extra_x = PadSpacing/2
-                usePadSize = PadSize - PadSpacing
-                if y < NumSmallerCols:
-                    extra_x = PadSpacing/2 + (PadSize - SmallPadSize)/2
-                    usePadSize = SmallPadSize
-
-                center_x = SensitiveEdge + (x + 0.5)*PadSize
-
-                minX = center_x - usePadSize/2
-                maxX = center_x + usePadSize/2
-
-                minY = SensitiveEdge + y*PadSize + PadSpacing/2
-                maxY = SensitiveEdge + (y+1)*PadSize - PadSpacing/2
-                self.padVec += [SensorPad(epochs = len(shifts), minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra_x=extra_x, extra_y=PadSpacing/2)]
-
-        self.numPads = len(self.padVec)
-
-    def _getAllPadCategories(self):
-        return ["left", "right"]
-
-    def _getPadCategory(self, padID):
-        if self.padVec[padID].maxX < 0:
-            return "left"
-        else:
-            return "right"
+        # The columns become rows, the smaller pads are in the bottom rows
+        smallColumn = PadColumn(padHeight=SmallPadSize, extraY=PadSpacing/2 + (PadSize - SmallPadSize)/2)
+        columns = [smallColumn]*NumSmallerCols + [PadColumn(padHeight=PadSize - PadSpacing)]*(16 - NumSmallerCols)
+        self.setLayout(PadLayout(columns, padSize=PadSize, padSpacing=PadSpacing, guardRing=GuardRing, transpose=True))
@@ -22,14 +22,60 @@
 
 from __future__ import annotations
 
+from collections.abc import Mapping
+
+import numpy
+
 valid_betastar = [0.15, 0.20, 0.50]
 
+class _FluenceColumnView(Mapping):
+    """Read-only dict-like view of a single x column of the fluence grid, keyed by y in m"""
+    def __init__(self, hitmap: PPSHitmap, xIdx: int):
+        self._hitmap = hitmap
+        self._column = hitmap.fluence[xIdx]
+
+    def __getitem__(self, yVal):
+        yIdx = self._hitmap._yIndex(yVal)
+        if yIdx is None or numpy.isnan(self._column[yIdx]):
+            raise KeyError(yVal)
+        return float(self._column[yIdx])
+
+    def __iter__(self):
+        for yIdx in numpy.flatnonzero(~numpy.isnan(self._column)):
+            yield self._hitmap._yValue(yIdx)
+
+    def __len__(self):
+        return int(numpy.count_nonzero(~numpy.isnan(self._column)))
+
+class _FluenceMapView(Mapping):
+    """Read-only view of the fluence grid with the old dict of dicts interface: map[x][y], x and y in m"""
+    def __init__(self, hitmap: PPSHitmap):
+        self._hitmap = hitmap
+        self._filled = ~numpy.isnan(hitmap.fluence).all(axis=1)
+
+    def __getitem__(self, xVal):
+        xIdx = self._hitmap._xIndex(xVal)
+        if xIdx is None or not self._filled[xIdx]:
+            raise KeyError(xVal)
+        return _FluenceColumnView(self._hitmap, xIdx)
+
+    def __iter__(self):
+        for xIdx in numpy.flatnonzero(self._filled):
+            yield self._hitmap._xValue(xIdx)
+
+    def __len__(self):
+        return int(numpy.count_nonzero(self._filled))
+
 class PPSHitmap:
-    map: dict
+    fluence: numpy.ndarray | None  # Indexed as [xIdx, yIdx], NaN for points missing from the file
     maxFluence: dict
     # Convert Phi 1fb-1 to Phi BX - multiply by 1.6 x 10^-12 Phi in units of particles/cm^2 Occupancy in units
     # of particles
     fluenceConversion: float = 1.6E-12
+    # Number of lines of the hitmap file parsed at a time. NumPy allocates 3 float64 (24 bytes) per line for the whole
+    # chunk before reading it, ~12 MB for the default, so the value is capped to maxParseChunkRows (~100 MB)
+    parseChunkRows: int = 1 << 19
+    maxParseChunkRows: int = 1 << 22
     def __init__(self,
                  filename: str,
                  station: str,
@@ -47,6 +93,9 @@ class PPSHitmap:
                  addBackgroundFlux: float | None = None,
                  peakLuminosity: float = 5E34, # in cm^-2 s^-1
                  collidingBunches: int = 2773, # Found this number so that the defaults match previous results
+                 dtype: str = "float64", # Use float32 to halve the memory of the fluence grid
+                 useCache: bool = True,
+                 cacheDir: str | None = None, # Defaults to a .hitmap_cache directory next to the hitmap file
                 ):
         self.filename = filename
         self.station = station
@@ -75,7 +124,15 @@ class PPSHitmap:
         if self.physics and self.calib:
             raise Exception("File {} has both physics and calibration set to true".format(self.filename))
 
-        self.map = {}
+        self._parseChunkRows()
+
+        self.dtype = numpy.dtype(dtype)
+        self.fluence = None
+        self._sat = None
+        self._rangeMax = None
+
+        self.useCache = useCache
+        self.cacheDir = cacheDir
 
         self.validated = False
 
@@ -95,39 +152,100 @@ class PPSHitmap:
         #  m^2 = 10^4 cm^2
         self.fluenceConversion = self.fluenceConversion * 10**(-28 +4 -15)
 
+    @property
+    def numBinsX(self):
+        return round((self.xMax - self.xMin)/self.xStep) + 1
+
+    @property
+    def numBinsY(self):
+        return round((self.yMax - self.yMin)/self.yStep) + 1
+
+    @property
+    def map(self):
+        """Compatibility view of the fluence grid as map[x][y], prefer using the fluence array directly"""
+        self._checkMap()
+        return _FluenceMapView(self)
+
+    def _xValue(self, xIdx: int):
+        return round(self.xMin + xIdx*self.xStep, 6)
+
+    def _yValue(self, yIdx: int):
+        return round(self.yMin + yIdx*self.yStep, 6)
+
+    def _xIndex(self, xVal: float):
+        xIdx = round((xVal - self.xMin)/self.xStep)
+        if xIdx < 0 or xIdx >= self.numBinsX or abs(self.xMin + xIdx*self.xStep - xVal) > self.xStep*1e-3:
+            return None
+        return xIdx
+
+    def _yIndex(self, yVal: float):
+        yIdx = round((yVal - self.yMin)/self.yStep)
+        if yIdx < 0 or yIdx >= self.numBinsY or abs(self.yMin + yIdx*self.yStep - yVal) > self.yStep*1e-3:
+            return None
+        return yIdx
+
+    def _fluenceAt(self, xIdx: int, yIdx: int):
+        """Fluence at the grid point, falling back to the background flux outside the map or for missing points"""
+        if xIdx < 0 or xIdx >= self.numBinsX or yIdx < 0 or yIdx >= self.numBinsY:
+            return self.addBackgroundFlux
+        value = self.fluence[xIdx, yIdx]
+        if numpy.isnan(value):
+            return self.addBackgroundFlux
+        return float(value)
+
     def validate(self):
         self._checkMap()
         if self.verbose:
             print("From {} to {} every {}: Range of {} in {} steps (x-axis)".format(self.xMin, self.xMax, self.xStep, self.xMax - self.xMin, ((self.xMax - self.xMin)/self.xStep)))
             print("From {} to {} every {}: Range of {} in {} steps (y-axis)".format(self.yMin, self.yMax, self.yStep, self.yMax - self.yMin, ((self.yMax - self.yMin)/self.yStep)))
         edgeIdx = int((self.detectorEdge - self.xMin)/self.xStep)
+        numX = int((self.xMax - self.xMin)/self.xStep)
+        numY = int((self.yMax - self.yMin)/self.yStep)
+        fluence = numpy.asarray(self.fluence[:numX, :numY])
+
+        missing = numpy.isnan(fluence)
+        if missing.any():
+            xIdx, yIdx = numpy.nonzero(missing)
+            self.missingPoints = numpy.column_stack([
+                numpy.round(self.xMin + xIdx*self.xStep, 6),
+                numpy.round(self.yMin + yIdx*self.yStep, 6),
+            ]) # in m
+            points = ", ".join("(x={}, y={})".format(x, y) for x, y in self.missingPoints[:20])
+            if len(self.missingPoints) > 20:
+                points += ", ... (the full list is in the missingPoints property)"
+            raise Exception("Did not find a fluence entry for {} for {} points: {}".format(self.filename, len(self.missingPoints), points))
+        self.missingPoints = numpy.empty((0, 2))
+
         self.maxFluence = {}
+        startIdx = max(edgeIdx, 0)
+        if startIdx < numX and numY > 0:
+            # argmax returns the first maximum in (x, y) order, same as scanning the points with a strict comparison
+            xIdx, yIdx = numpy.unravel_index(numpy.argmax(fluence[startIdx:]), fluence[startIdx:].shape)
+            xIdx = int(xIdx) + startIdx
+            yIdx = int(yIdx)
+            self.maxFluence = {
+                "x": self._xValue(xIdx),
+                "y": self._yValue(yIdx),
+                "xIdx": xIdx,
+                "yIdx": yIdx,
+                "fluence": float(fluence[xIdx, yIdx])
+            }
+
         self.ridge = {}
-        for xIdx in range(int((self.xMax - self.xMin)/self.xStep)):
-            xVal = round(self.xMin + xIdx*self.xStep, 6)
-            for yIdx in range(int((self.yMax - self.yMin)/self.yStep)):
-                yVal = round(self.yMin + yIdx*self.yStep, 6)
-
-                if not (xVal in self.map and yVal in self.map[xVal]):
-                    raise Exception("Did not find a fluence entry for {} for x={}, y={}".format(self.filename, xVal, yVal))
-
-                if xIdx >= edgeIdx:
-                    if ("x" not in self.maxFluence) or (self.map[xVal][yVal] > self.maxFluence["fluence"]):
-                        self.maxFluence = {
-                            "x": xVal,
-                            "y": yVal,
-                            "xIdx": xIdx,
-                            "yIdx": yIdx,
-                            "fluence": self.map[xVal][yVal]
-                        }
-                if (xIdx not in self.ridge) or (self.map[xVal][yVal] > self.ridge[xIdx]["fluence"]):
-                    self.ridge[xIdx] = {
-                        "x": xVal,
-                        "y": yVal,
-                        "xIdx": xIdx,
-                        "yIdx": yIdx,
-                        "fluence": self.map[xVal][yVal]
-                    }
+        if numY > 0:
+            self.ridgeIdx = numpy.argmax(fluence, axis=1) # yIdx of the maximum of each x column
+            ridgeFluence = fluence[numpy.arange(numX), self.ridgeIdx]
+            for xIdx in range(numX):
+                yIdx = int(self.ridgeIdx[xIdx])
+                self.ridge[xIdx] = {
+                    "x": self._xValue(xIdx),
+                    "y": self._yValue(yIdx),
+                    "xIdx": xIdx,
+                    "yIdx": yIdx,
+                    "fluence": float(ridgeFluence[xIdx])
+                }
+        else:
+            self.ridgeIdx = numpy.empty(0, dtype=numpy.int64)
         self.validated = True
         #self._freeMap()
 
@@ -138,33 +256,197 @@ class PPSHitmap:
     def _checkValid(self):
         self._checkMap()
         if not self.validated:
-            print("The file {} has not yet been validated to contain all points, it will be validated now and may take some time, if the file has been previously validated, you can remove this check by setting the validated property to True".format(self.filename))
+            print("The file {} has not yet been validated to contain all points, it will be validated now, if the file has been previously validated, you can remove this check by setting the validated property to True".format(self.filename))
             self.validate()
 
             if not self.validated:
                 raise Exception("There was a problem validating the file {}".format(self.filename))
 
     def _checkMap(self):
-        if len(self.map) == 0:
+        if self.fluence is None:
             self._loadMap()
 
     def _loadMap(self):
-        self.map = {}
+        fluence = None
+        if self.useCache:
+            fluence = self._readCache()
+
+        if fluence is None:
+            fluence = self._parseMap()
+            # The cached grid includes the background flux, so the memory-mapped cache is used as is
+            if self.addBackgroundFlux is not None and self.addBackgroundFlux != 0:
+                fluence += self.addBackgroundFlux
+            if self.useCache:
+                self._writeCache(fluence)
+
+        self.fluence = fluence
+        self._sat = None
+        self._rangeMax = None
+
+    def _parseMap(self):
+        """Parse the hitmap text file into the fluence grid, without the background flux
+
+        The file is read in chunks of parseChunkRows lines with the NumPy C tokenizer and each chunk of (x, y, fluence)
+        triples is scattered into the grid with computed indices, so memory stays bounded for arbitrarily large files.
+        """
+        import warnings
+
+        chunkRows = self._parseChunkRows()
+        fluence = numpy.full((self.numBinsX, self.numBinsY), numpy.nan, dtype=self.dtype)
         with open(self.filename) as file:
-            for line in file:
-                # Units are in m and fix type
-                pLine = [float(x) for x in line.rstrip().split(' ')]
+            while True:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")  # Reading past the last line warns about empty input
+                    # Units are in m
+                    chunk = numpy.loadtxt(file, dtype=numpy.float64, max_rows=chunkRows, ndmin=2)
+                if len(chunk) == 0:
+                    break
+
+                xIdx, xValid = self._gridIndices(chunk[:, 0], self.xMin, self.xStep, self.numBinsX)
+                yIdx, yValid = self._gridIndices(chunk[:, 1], self.yMin, self.yStep, self.numBinsY)
+                valid = xValid & yValid  # Points outside the configured grid are dropped
+
+                fluence[xIdx[valid], yIdx[valid]] = chunk[valid, 2]
+        return fluence
+
+    def _parseChunkRows(self):
+        """Number of lines per parsed chunk, parseChunkRows capped to maxParseChunkRows"""
+        if not isinstance(self.parseChunkRows, int) or self.parseChunkRows <= 0:
+            raise ValueError("parseChunkRows must be a positive integer, got {}".format(self.parseChunkRows))
+        return min(self.parseChunkRows, self.maxParseChunkRows)
+
+    @staticmethod
+    def _gridIndices(values: numpy.ndarray, minVal: float, step: float, numBins: int):
+        """Vectorized counterpart of _xIndex/_yIndex, returns the indices and a mask of the values on the grid"""
+        indices = numpy.rint((values - minVal)/step).astype(numpy.int64)
+        valid = (indices >= 0) & (indices < numBins) & (numpy.abs(minVal + indices*step - values) <= step*1e-3)
+        return indices, valid
+
+    def _cacheFiles(self):
+        """Paths of the binary grid and of its json header for the current file, grid settings and background flux"""
+        from pathlib import Path
+        import hashlib
+        import json
+
+        source = Path(self.filename).resolve()
+        cacheDir = Path(self.cacheDir) if self.cacheDir is not None else source.parent/".hitmap_cache"
+
+        gridKey = json.dumps([str(source), self.xMin, self.xMax, self.xStep, self.yMin, self.yMax, self.yStep, self.dtype.str, self.addBackgroundFlux])
+        gridKey = hashlib.sha1(gridKey.encode()).hexdigest()[:16]
+
+        base = cacheDir/"{}.{}".format(source.name, gridKey)
+        return base.with_name(base.name + ".npy"), base.with_name(base.name + ".json")
+
+    def _contentHash(self):
+        import hashlib
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(self.filename, "rb") as file:
+            for block in iter(lambda: file.read(1 << 24), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _readCache(self):
+        """Memory-map the cached grid if it is still valid for the source file, otherwise return None"""
+        import json
+        import os
+
+        gridFile, headerFile = self._cacheFiles()
+        if not (gridFile.exists() and headerFile.exists()):
+            return None
 
-                if pLine[0] not in self.map:
-                    self.map[pLine[0]] = {}
+        try:
+            with open(headerFile) as file:
+                header = json.load(file)
+            stat = os.stat(self.filename)
+
+            if header["size"] != stat.st_size:
+                return None
+            if header["mtime_ns"] != stat.st_mtime_ns:
+                # The file was touched, only trust the cache if the contents are unchanged
+                if header["hash"] != self._contentHash():
+                    return None
+                header["mtime_ns"] = stat.st_mtime_ns
+                self._writeJson(headerFile, header)
+
+            fluence = numpy.load(gridFile, mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            if self.verbose:
+                print("Unable to use the cached grid {}: {}".format(gridFile, e))
+            return None
 
-                self.map[pLine[0]][pLine[1]] = pLine[2]
-                if self.addBackgroundFlux is not None:
-                    self.map[pLine[0]][pLine[1]] += self.addBackgroundFlux
+        if fluence.shape != (self.numBinsX, self.numBinsY) or fluence.dtype != self.dtype:
+            return None
+
+        if self.verbose:
+            print("Loaded the fluence grid of {} from the cache {}".format(self.filename, gridFile))
+        return fluence
+
+    def _writeCache(self, fluence: numpy.ndarray):
+        import os
+
+        gridFile, headerFile = self._cacheFiles()
+        try:
+            stat = os.stat(self.filename)
+            header = {
+                "source": str(self.filename),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "hash": self._contentHash(),
+                "shape": list(fluence.shape),
+                "dtype": fluence.dtype.str,
+            }
+
+            gridFile.parent.mkdir(parents=True, exist_ok=True)
+            with self._tempFile(gridFile, "wb") as file:
+                numpy.save(file, fluence)
+            os.replace(file.name, gridFile)
+            self._writeJson(headerFile, header)
+        except OSError as e:
+            # Caching is only an optimisation, e.g. the hitmap directory may be read-only
+            if self.verbose:
+                print("Unable to cache the fluence grid of {}: {}".format(self.filename, e))
+
+    @staticmethod
+    def _tempFile(path, mode: str):
+        """Unique temporary file next to path, so that concurrent processes never write to the same file"""
+        import tempfile
+
+        return tempfile.NamedTemporaryFile(mode, dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False)
+
+    @staticmethod
+    def _writeJson(path, data: dict):
+        import json
+        import os
+
+        with PPSHitmap._tempFile(path, "w") as file:
+            json.dump(data, file)
+        os.replace(file.name, path)
+
+    def clearCache(self):
+        """Remove the cached binary grid for this file and grid settings"""
+        for path in self._cacheFiles():
+            if path.exists():
+                path.unlink()
 
     def _freeMap(self):
-        if len(self.map) != 0:
-            self.map = {}
+        self.fluence = None
+        self._sat = None
+        self._rangeMax = None
+
+    def _histoAxes(self):
+        """Number of bins and limits of the fluence histograms along x and y, in mm, with one bin per map point"""
+        binX, binY = self.fluence.shape
+        xMin = self.xMin - self.xStep/2
+        xMax = self.xMax + self.xStep/2
+        yMin = self.yMin - self.yStep/2
+        yMax = self.yMax + self.yStep/2
+
+        return (binX, xMin*1000, xMax*1000), (binY, yMin*1000, yMax*1000) # *1000 for units in mm
+
+    def _histoContent(self):
+        """Fluence to fill the histograms with, the missing points are left empty"""
+        return numpy.where(numpy.isnan(self.fluence), 0, self.fluence)
 
     def getHisto(
             self,
@@ -175,15 +457,11 @@ class PPSHitmap:
 
         from ROOT import TH2D  # type: ignore
         from ROOT import kFALSE  # type: ignore
+        from .exports import fillTH2
 
-        binX = int((self.xMax - self.xMin)/self.xStep) + 1
-        xMin = self.xMin - self.xStep/2
-        xMax = self.xMax + self.xStep/2
-        binY = int((self.yMax - self.yMin)/self.yStep) + 1
-        yMin = self.yMin - self.yStep/2
-        yMax = self.yMax + self.yStep/2
+        axisX, axisY = self._histoAxes()
 
-        hist = TH2D(name, title, binX, xMin*1000, xMax*1000, binY, yMin*1000, yMax*1000) # *1000 for units in mm
+        hist = TH2D(name, title, *axisX, *axisY)
         hist.SetStats(kFALSE)
         hist.GetXaxis().SetTitle( "x [mm]" )
         hist.GetYaxis().SetTitle( "y [mm]" )
@@ -197,20 +475,33 @@ class PPSHitmap:
         #hist.GetXaxis().SetTitleFont(62) hist.GetYaxis().SetTitleFont(62) hist.GetZaxis().SetTitleFont(62)
         #hist.GetXaxis().SetLabelFont(62) hist.GetYaxis().SetLabelFont(62) hist.GetZaxis().SetLabelFont(62)
 
-        for xIdx in range(int((self.xMax - self.xMin)/self.xStep)):
-            xVal = round(self.xMin + xIdx*self.xStep, 6)
-            for yIdx in range(int((self.yMax - self.yMin)/self.yStep)):
-                yVal = round(self.yMin + yIdx*self.yStep, 6)
-                hist.SetBinContent(hist.FindBin(xVal*1000, yVal*1000), self.map[xVal][yVal])
+        fillTH2(hist, self._histoContent())
 
         return hist
 
+    def getHist(
+            self,
+            name: str | None = None,
+            label: str = "Fluence [p / (cm$^2$ fb$^{-1}$)]",
+                ):
+        """Same as getHisto, as a hist.Hist instead of a ROOT TH2D"""
+        self._checkValid()
+
+        import hist
+
+        axisX, axisY = self._histoAxes()
+
+        histogram = hist.Hist.new.Reg(*axisX, name="x", label="x [mm]").Reg(*axisY, name="y", label="y [mm]").Double(name=name, label=label)
+        histogram.view()[...] = self._histoContent()
+
+        return histogram
+
     def peakUniformPadOccupancy(
             self,
             xLen: float,
             yLen: float,
                                 ):
-        """xLen and yLen in m"""
+        """xLen and yLen in m, they can also be arrays, which are broadcast against each other"""
         self._checkValid()
 
         # Convert Phi 1fb-1 to Phi BX - multiply by 1.6 x 10^-12 Phi in units of particles/cm^2 Occupancy in units
@@ -225,53 +516,219 @@ class PPSHitmap:
             xLen: float,
             yLen: float,
                               ):
-        """xLen and yLen in m"""
+        """xLen and yLen in m, they can also be arrays, which are broadcast against each other"""
         self._checkValid()
 
-        from math import ceil, floor
-
-        # Convert Phi 1fb-1 to Phi BX - multiply by 1.6 x 10^-12 Phi in units of particles/cm^2 Occupancy in units
-        # of particles
-
-        xBins = ceil(xLen/self.xStep)
-        yBins = ceil(yLen/self.yStep * 0.5 - 0.5) * 2 + 1  # The pad is centered on the bin of max fluence, so we need to adjust things around
-        minY = self.maxFluence["yIdx"] - floor(yBins/2)
-        maxY = self.maxFluence["yIdx"] + floor(yBins/2)
+        xLen = numpy.asarray(xLen, dtype=numpy.float64)
+        yLen = numpy.asarray(yLen, dtype=numpy.float64)
 
+        # The pad starts at the left edge of the bin of max fluence and is centered on it in y
         leftPad = self.maxFluence["x"] - self.xStep/2
         rightPad = self.maxFluence["x"] - self.xStep/2 + xLen
         bottomPad = self.maxFluence["y"] - yLen/2
         topPad = self.maxFluence["y"] + yLen/2
 
-        fluence = 0
-        for xIdx in range(self.maxFluence["xIdx"], self.maxFluence["xIdx"] + xBins):
-            xVal = round(self.xMin + xIdx*self.xStep, 6)
-            for yIdx in range(minY, maxY + 1):
-                yVal = round(self.yMin + yIdx*self.yStep, 6)
-                left = xVal - self.xStep/2
-                right = xVal + self.xStep/2
-                bottom = yVal - self.yStep/2
-                top = yVal + self.yStep/2
-
-                contributionX = 1
-                if right > rightPad:
-                    contributionX -= (right - rightPad)/self.xStep
-                if left < leftPad:
-                    contributionX -= (left - leftPad)/self.xStep
-
-                contributionY = 1
-                if top > topPad:
-                    contributionY -= (top - topPad)/self.yStep
-                if bottom < bottomPad:
-                    contributionY -= (bottomPad - bottom)/self.yStep
-                if xVal not in self.map or yVal not in self.map[xVal]:
-                    fluence += self.addBackgroundFlux * contributionX * contributionY
-                else:
-                    fluence += self.map[xVal][yVal] * contributionX * contributionY
+        fluence = self.integrateFluence(leftPad, rightPad, bottomPad, topPad)
 
+        # Convert Phi 1fb-1 to Phi BX - multiply by 1.6 x 10^-12 Phi in units of particles/cm^2 Occupancy in units
+        # of particles
         occupancy = fluence * self.fluenceConversion * (self.xStep * self.yStep) * 1.0E4
+        if occupancy.ndim == 0:
+            return float(occupancy)
         return occupancy
 
+    def _summedAreaTable(self):
+        """
+        Summed-area table of the fluence grid, built once per loaded map: sat[i, j] is the sum of the fluence of the
+        bins with xIdx < i and yIdx < j. Missing points count with the background flux.
+        """
+        if self._sat is None:
+            self._checkMap()
+            fluence = numpy.where(numpy.isnan(self.fluence), self.addBackgroundFlux, self.fluence)
+
+            sat = numpy.zeros((fluence.shape[0] + 1, fluence.shape[1] + 1), dtype=numpy.float64)
+            numpy.cumsum(fluence, axis=0, dtype=numpy.float64, out=sat[1:, 1:])
+            numpy.cumsum(sat[1:, 1:], axis=1, out=sat[1:, 1:])
+            self._sat = sat
+        return self._sat
+
+    def _cumulativeFluence(self, u, v):
+        """
+        Integral of the fluence from the lower left corner of the grid up to (u, v), in bin units. The fluence is
+        constant within each bin, so bilinear interpolation of the summed-area table is exact.
+        """
+        sat = self._summedAreaTable()
+        numX = sat.shape[0] - 1
+        numY = sat.shape[1] - 1
+
+        xIdx = numpy.minimum(numpy.floor(u).astype(numpy.int64), numX - 1)
+        yIdx = numpy.minimum(numpy.floor(v).astype(numpy.int64), numY - 1)
+        fu = u - xIdx
+        fv = v - yIdx
+
+        return ((1 - fu)*(1 - fv)*sat[xIdx, yIdx] + fu*(1 - fv)*sat[xIdx + 1, yIdx] +
+                (1 - fu)*fv*sat[xIdx, yIdx + 1] + fu*fv*sat[xIdx + 1, yIdx + 1])
+
+    def integrateFluence(self, minX, maxX, minY, maxY):
+        """
+        Integrate the fluence over the rectangles [minX, maxX] x [minY, maxY], in m, weighting each bin by the fraction
+        of its area inside the rectangle. The result is in units of fluence times number of bins, multiply by the bin
+        area to get particles. The area outside the map contributes with the background flux.
+        The arguments can be scalars or arrays, they are broadcast against each other. Each call is O(1) per rectangle.
+        """
+        sat = self._summedAreaTable()
+        numX = sat.shape[0] - 1
+        numY = sat.shape[1] - 1
+
+        # Coordinates in bin units, with 0 at the lower edge of the first bin
+        u0 = (numpy.asarray(minX, dtype=numpy.float64) - self.xMin)/self.xStep + 0.5
+        u1 = (numpy.asarray(maxX, dtype=numpy.float64) - self.xMin)/self.xStep + 0.5
+        v0 = (numpy.asarray(minY, dtype=numpy.float64) - self.yMin)/self.yStep + 0.5
+        v1 = (numpy.asarray(maxY, dtype=numpy.float64) - self.yMin)/self.yStep + 0.5
+
+        cu0 = numpy.clip(u0, 0, numX)
+        cu1 = numpy.clip(u1, 0, numX)
+        cv0 = numpy.clip(v0, 0, numY)
+        cv1 = numpy.clip(v1, 0, numY)
+
+        inside = (self._cumulativeFluence(cu1, cv1) - self._cumulativeFluence(cu0, cv1) -
+                  self._cumulativeFluence(cu1, cv0) + self._cumulativeFluence(cu0, cv0))
+        outsideArea = (u1 - u0)*(v1 - v0) - (cu1 - cu0)*(cv1 - cv0)
+
+        return inside + outsideArea*self.addBackgroundFlux
+
+    def binRanges(self, minX, maxX, minY, maxY):
+        """
+        Index ranges [xLo, xHi) and [yLo, yHi) of the grid bins overlapping the rectangles [minX, maxX] x [minY, maxY],
+        in m. Bins that only touch the rectangle edge are not included. The arguments are broadcast against each other.
+        """
+        def _range(minVal, maxVal, gridMin, step, numBins):
+            # Bin i spans [i - 0.5, i + 0.5] in bin units, the tolerance protects against rounding at shared edges
+            lo = numpy.floor((numpy.asarray(minVal) - gridMin)/step - 0.5 + 1e-6).astype(numpy.int64) + 1
+            hi = numpy.ceil((numpy.asarray(maxVal) - gridMin)/step + 0.5 - 1e-6).astype(numpy.int64)
+            lo = numpy.clip(lo, 0, numBins)
+            hi = numpy.clip(hi, lo, numBins)
+            return lo, hi
+
+        xLo, xHi = _range(minX, maxX, self.xMin, self.xStep, self.numBinsX)
+        yLo, yHi = _range(minY, maxY, self.yMin, self.yStep, self.numBinsY)
+        return numpy.broadcast_arrays(xLo, xHi, yLo, yHi)
+
+    def _rangeMaxTable(self, level: int):
+        """
+        Sparse table of the fluence grid along y, built up to the requested level on first use: level k is an array of
+        shape (numBinsX, numBinsY - 2^k + 1) with the maximum over the 2^k bins starting at each yIdx, NaN skipped.
+        Each level costs up to one fluence grid of memory, a pad spanning n bins in y needs log2(n) levels.
+        """
+        if self._rangeMax is None:
+            self._checkMap()
+            self._rangeMax = [self.fluence]
+        while len(self._rangeMax) <= level:
+            half = 1 << (len(self._rangeMax) - 1)
+            previous = self._rangeMax[-1]
+            self._rangeMax.append(numpy.fmax(previous[:, :-half], previous[:, half:]))
+        return self._rangeMax[level]
+
+    def maxFluenceInRanges(self, xLo, xHi, yLo, yHi):
+        """Maximum fluence within each of the bin index ranges returned by binRanges, NaN for empty ranges"""
+        self._checkMap()
+        xLo, xHi, yLo, yHi = numpy.broadcast_arrays(xLo, xHi, yLo, yHi)
+        shape = xLo.shape
+        xLo, xHi, yLo, yHi = [numpy.asarray(idx, dtype=numpy.int64).ravel() for idx in (xLo, xHi, yLo, yHi)]
+
+        maxFluence = numpy.full(xLo.shape, numpy.nan)
+        ranges = numpy.flatnonzero((xHi > xLo) & (yHi > yLo))
+        if len(ranges) == 0:
+            return maxFluence.reshape(shape)
+        xLo, xHi, yLo, yHi = xLo[ranges], xHi[ranges], yLo[ranges], yHi[ranges]
+
+        # Every range is covered by its x rows, repeating the last one for the narrower ranges, and along y by the two
+        # overlapping 2^level bin blocks of the sparse table starting at yLo and ending at yHi
+        rows = numpy.minimum(xLo[:, None] + numpy.arange((xHi - xLo).max()), xHi[:, None] - 1)
+        levels = numpy.frexp(yHi - yLo)[1] - 1
+
+        rowMax = numpy.empty(rows.shape, dtype=numpy.float64)
+        for level in numpy.unique(levels):
+            selected = levels == level
+            table = self._rangeMaxTable(int(level))
+            lower = table[rows[selected], yLo[selected, None]]
+            upper = table[rows[selected], yHi[selected, None] - (1 << int(level))]
+            rowMax[selected] = numpy.fmax(lower, upper)
+
+        maxFluence[ranges] = numpy.fmax.reduce(rowMax, axis=1) # fmax skips the missing points
+        return maxFluence.reshape(shape)
+
+    def _firstRidgeIndex(self):
+        """Index of the first ridge point within the detector window"""
+        for idx in range(len(self.ridge)):
+            if self.ridge[idx]["x"] >= self.detectorEdge:
+                return idx
+        raise ValueError("There was a problem, unable to find the maximum of the map within the detector window")
+
+    def shiftProfiles(
+            self,
+            integratedLuminosity: float = 300,
+            padLength: float = 1.3,
+            numPadCols: int = 2,
+            maxNumShifts: int = 4,
+            maxShift: float = 10,
+                      ):
+        """
+        End of life flux on the ridge of each pad column, in p/cm^2, averaged over nShift + 1 equally spaced positions
+        for nShift from 1 to maxNumShifts and total shifts up to maxShift (in mm). padLength is the pad column width,
+        in mm. Returns a dictionary with:
+          - shift: array of shape (maxNumShifts, numSteps) with the total shift in mm, NaN padded as there are fewer
+                   steps for more shifts
+          - numPoints: number of valid steps for each number of shifts
+          - med, up, down: arrays of shape (numPadCols, maxNumShifts, numSteps) for the positions centered on the
+                           ridge, all above it and all below it
+        """
+        self._checkValid()
+
+        firstIdx = self._firstRidgeIndex()
+        columns = [firstIdx + int(col*(padLength)/(self.xStep*1000)) for col in range(numPadCols)]
+        xIdx = numpy.array([self.ridge[idx]['xIdx'] for idx in columns], dtype=numpy.int64)
+        yIdx = numpy.array([self.ridge[idx]['yIdx'] for idx in columns], dtype=numpy.int64)[:, None]
+
+        # Fluence along the ridge column of each pad column, the missing points count with the background flux
+        fluence = self.fluence[xIdx]
+        fluence = numpy.where(numpy.isnan(fluence), self.addBackgroundFlux, fluence)
+
+        def gather(yIndices):
+            inside = (yIndices >= 0) & (yIndices < self.numBinsY)
+            values = numpy.take_along_axis(fluence, numpy.clip(yIndices, 0, self.numBinsY - 1), axis=1)
+            return numpy.where(inside, values, self.addBackgroundFlux)
+
+        # The range is in m, divided by the step size of each shift in fluence bins
+        numPoints = numpy.array([max(int(maxShift/1000/(nShift*self.yStep)) - 1, 0) for nShift in range(1, maxNumShifts + 1)], dtype=numpy.int64)
+        numSteps = int(numPoints.max()) if maxNumShifts > 0 else 0
+
+        shift = numpy.full((maxNumShifts, numSteps), numpy.nan)
+        profiles = {key: numpy.full((numPadCols, maxNumShifts, numSteps), numpy.nan) for key in ['med', 'up', 'down']}
+        for nShift in range(1, maxNumShifts + 1):
+            shiftIdx = numpy.arange(1, numPoints[nShift - 1] + 1)
+            shift[nShift - 1, :len(shiftIdx)] = shiftIdx * self.yStep * nShift * 1000
+
+            # Strided gathers along the column, summed in the same order as the positions
+            fluxMed = 0
+            fluxPlus = 0
+            fluxMinus = 0
+            for i in range(nShift + 1):
+                index = -int(nShift/2) + i
+                fluxMed = fluxMed + gather(yIdx + index*shiftIdx) * integratedLuminosity/(nShift+1)
+                fluxPlus = fluxPlus + gather(yIdx + i*shiftIdx) * integratedLuminosity/(nShift+1)
+                fluxMinus = fluxMinus + gather(yIdx - i*shiftIdx) * integratedLuminosity/(nShift+1)
+
+            profiles['med'][:, nShift - 1, :len(shiftIdx)] = fluxMed
+            profiles['up'][:, nShift - 1, :len(shiftIdx)] = fluxPlus
+            profiles['down'][:, nShift - 1, :len(shiftIdx)] = fluxMinus
+
+        return {
+            'shift': shift,
+            'numPoints': numPoints,
+            **profiles,
+        }
+
     def plotShifts(
             self,
             integratedLuminosity: float = 300,
@@ -283,25 +740,20 @@ class PPSHitmap:
             baseColor = None,
             colorOffset: int = 3,
             drawOneSided: bool = False,
+            maxShift: float = 10,
                    ):
         self._checkValid()
-
-        firstIdx = None
-        for idx in range(len(self.ridge)):
-            if self.ridge[idx]["x"] >= self.detectorEdge:
-                firstIdx = idx
-                break
-        if firstIdx is None:
-            raise ValueError("There was a problem, unable to find the maximum of the map within the detector window")
+        self._firstRidgeIndex()
 
         from ROOT import TCanvas  # type: ignore
         from ROOT import TH1D  # type: ignore
         from ROOT import TLine  # type: ignore
-        from ROOT import TGraph  # type: ignore
         from ROOT import TLegend  # type: ignore
         from ROOT import kRed, kAzure  # type: ignore
-        from array import array
         from math import ceil
+        from .exports import toTGraph
+
+        profiles = self.shiftProfiles(integratedLuminosity=integratedLuminosity, padLength=padLength, numPadCols=plotPadCols, maxNumShifts=maxNumShifts, maxShift=maxShift)
 
         if plotPadCols < maxCols:
             padCols = plotPadCols
@@ -314,7 +766,7 @@ class PPSHitmap:
         canv.Divide(padCols, padRows)
 
         if thresholdFlux is not None:
-            persistance["ThresholdLine"] = TLine(0, thresholdFlux, 10, thresholdFlux)
+            persistance["ThresholdLine"] = TLine(0, thresholdFlux, maxShift, thresholdFlux)
             persistance["ThresholdLine"].SetLineColor(kRed)
             persistance["ThresholdLine"].SetLineStyle(2)
 
@@ -325,7 +777,7 @@ class PPSHitmap:
             pad.SetLogy()
             pad.SetTicks()
 
-            hist = TH1D("shifts_pad_col_{}".format(col), "Pad Column {} Shifts at {} {}".format(col, integratedLuminosity, "fb^{-1}"), 2, 0, 10)
+            hist = TH1D("shifts_pad_col_{}".format(col), "Pad Column {} Shifts at {} {}".format(col, integratedLuminosity, "fb^{-1}"), 2, 0, maxShift)
 
             hist.SetStats(False)
             hist.GetXaxis().SetTitle( "#Delta y [mm]" )
@@ -339,10 +791,6 @@ class PPSHitmap:
             if thresholdFlux is not None:
                 persistance["ThresholdLine"].Draw("same")
 
-            # Fetch ridge position indexes for current column
-            xIdx = self.ridge[firstIdx+int(col*(padLength)/(self.xStep*1000))]['xIdx']
-            yIdx = self.ridge[firstIdx+int(col*(padLength)/(self.xStep*1000))]['yIdx']
-
             persistance["pad_col_{}_legend".format(col)] = TLegend(0.75,0.9,0.9,0.9 - 0.05*maxNumShifts)
 
             minFlux = -10.0
@@ -351,69 +799,24 @@ class PPSHitmap:
                 baseColor = kAzure
             for nShift in range(1, maxNumShifts+1):
                 lineColor = baseColor + colorOffset*(nShift-1)
-                xArr, yArrMed, yArrUp, yArrDown = array( 'd' ), array( 'd' ), array( 'd' ), array( 'd' )
-
-                # The 0.01 is 10 mm in m, this is the maximum range of the plot
-                # Divide by the number of shifts to get the step size of each shift
-                # Divide by the step size of the fluence bins, to get the number if fluence bins in each shift
-                for shiftIdx in range(1,int(0.01/(nShift*self.yStep))):
-                    shift = shiftIdx * self.yStep * nShift # Total shift
-                    xArr.append(shift * 1000)
-
-                    fluxMed = 0
-                    for i in range(nShift + 1):
-                        index = -int(nShift/2) + i
-                        xVal = round(self.xMin + xIdx*self.xStep, 6)
-                        yVal = round(self.yMin + (yIdx + index*shiftIdx)*self.yStep, 6)
-                        if xVal not in self.map or yVal not in self.map[xVal]:
-                            fluxMed += self.addBackgroundFlux * integratedLuminosity/(nShift+1)
-                        else:
-                            fluxMed += self.map[xVal][yVal] * integratedLuminosity/(nShift+1)
-                    yArrMed.append(fluxMed)
-
-                    fluxPlus = 0
-                    for i in range(nShift + 1):
-                        xVal = round(self.xMin + xIdx*self.xStep, 6)
-                        yVal = round(self.yMin + (yIdx + i*shiftIdx)*self.yStep, 6)
-                        if xVal not in self.map or yVal not in self.map[xVal]:
-                            fluxPlus += self.addBackgroundFlux * integratedLuminosity/(nShift+1)
-                        else:
-                            fluxPlus += self.map[xVal][yVal] * integratedLuminosity/(nShift+1)
-                    yArrUp.append(fluxPlus)
-
-                    fluxMinus = 0
-                    for i in range(nShift + 1):
-                        xVal = round(self.xMin + xIdx*self.xStep, 6)
-                        yVal = round(self.yMin + (yIdx - i*shiftIdx)*self.yStep, 6)
-                        if xVal not in self.map or yVal not in self.map[xVal]:
-                            fluxMinus += self.addBackgroundFlux * integratedLuminosity/(nShift+1)
-                        else:
-                            fluxMinus += self.map[xVal][yVal] * integratedLuminosity/(nShift+1)
-                    yArrDown.append(fluxMinus)
+                numPoints = profiles['numPoints'][nShift-1]
 
+                xArr = profiles['shift'][nShift-1, :numPoints]
+                yArrMed = profiles['med'][col, nShift-1, :numPoints]
+                yArrUp = profiles['up'][col, nShift-1, :numPoints]
+                yArrDown = profiles['down'][col, nShift-1, :numPoints]
+
+                if numPoints > 0:
                     if minFlux < 0:
-                        minFlux = fluxPlus
+                        minFlux = float(yArrUp[0])
                     if maxFlux < 0:
-                        maxFlux = fluxPlus
-
-                    if fluxPlus > maxFlux:
-                        maxFlux = fluxPlus
-                    if fluxPlus < minFlux:
-                        minFlux = fluxPlus
-
-                    if fluxMinus > maxFlux:
-                        maxFlux = fluxMinus
-                    if fluxMinus < minFlux:
-                        minFlux = fluxMinus
-
-                    if fluxMed > maxFlux:
-                        maxFlux = fluxMed
-                    if fluxMed < minFlux:
-                        minFlux = fluxMed
-
-                graphMed  = TGraph(len(xArr), xArr, yArrMed)
-                graphUp   = TGraph(len(xArr), xArr, yArrUp)
-                graphDown = TGraph(len(xArr), xArr, yArrDown)
+                        maxFlux = float(yArrUp[0])
+                    minFlux = min(minFlux, float(yArrMed.min()), float(yArrUp.min()), float(yArrDown.min()))
+                    maxFlux = max(maxFlux, float(yArrMed.max()), float(yArrUp.max()), float(yArrDown.max()))
+
+                graphMed  = toTGraph(xArr, yArrMed)
+                graphUp   = toTGraph(xArr, yArrUp)
+                graphDown = toTGraph(xArr, yArrDown)
                 graphMed.SetLineColor(lineColor)
                 graphUp.SetLineColor(lineColor)
                 graphDown.SetLineColor(lineColor)
@@ -455,34 +858,45 @@ class PPSHitmap:
 
         return canv, persistance
 
-    def squarePadPeakUniformScan(
-            self,
-            bins: int,
-            minPad: float,
-            maxPad: float,
-            doLog: bool = False,
-                                 ):
+    @staticmethod
+    def _scanPadSizes(bins: int, minPad: float, maxPad: float, doLog: bool = False):
+        """Array of bins pad sizes from minPad to maxPad, evenly spaced or evenly spaced in log scale"""
         if bins <= 1:
             raise ValueError("You must set 2 or more bins for the bin integration")
         if doLog and minPad == 0:
             raise ValueError("You can not set the minimum to 0 when using a logarithm scale")
 
         from math import log
-        padSize = []
-        occupancy = []
 
-        step = (maxPad - minPad)/(bins-1)
+        ibin = numpy.arange(bins)
         if doLog:
             step = (log(maxPad,2) - log(minPad,2))/(bins-1)
+            return 2**(ibin * step + log(minPad,2))
 
-        for ibin in range(bins):
-            if doLog:
-                padSize += [2**(ibin * step + log(minPad,2))]
-            else:
-                padSize += [ibin * step + minPad]
-            occupancy += [self.peakUniformPadOccupancy(padSize[ibin], padSize[ibin])]
+        step = (maxPad - minPad)/(bins-1)
+        return ibin * step + minPad
+
+    @staticmethod
+    def _checkFixedLength(xLen: float | None, yLen: float | None):
+        if xLen is None and yLen is None:
+            raise RuntimeError("You must specify a fixed value for either the x length of the pad or the y length of the pad, none was set")
+        if xLen is not None and yLen is not None:
+            raise RuntimeError("You must specify a fixed value for either the x length of the pad or the y length of the pad, both were set")
+
+    def squarePadPeakUniformScan(
+            self,
+            bins: int,
+            minPad: float,
+            maxPad: float,
+            doLog: bool = False,
+                                 ):
+        """Occupancy of a square pad on the peak fluence, for bins pad sizes, returns the (padSize, occupancy) arrays"""
+        padSize = self._scanPadSizes(bins, minPad, maxPad, doLog)
+        occupancy = self.peakUniformPadOccupancy(padSize, padSize)
+        if occupancy is None:
+            occupancy = numpy.full(bins, numpy.nan)
 
-        return (padSize,occupancy)
+        return (padSize, occupancy)
 
     def squarePadIntegrateScan(
             self,
@@ -491,27 +905,29 @@ class PPSHitmap:
             maxPad: float,
             doLog: bool = False,
                                ):
-        if bins <= 1:
-            raise ValueError("You must set 2 or more bins for the bin integration")
-        if doLog and minPad == 0:
-            raise ValueError("You can not set the minimum to 0 when using a logarithm scale")
+        """Integrated occupancy of a square pad at the peak, for bins pad sizes, returns the (padSize, occupancy) arrays"""
+        padSize = self._scanPadSizes(bins, minPad, maxPad, doLog)
 
-        from math import log
-        padSize = []
-        occupancy = []
+        return (padSize, self.integratePadOccupancy(padSize, padSize))
 
-        step = (maxPad - minPad)/(bins-1)
-        if doLog:
-            step = (log(maxPad,2) - log(minPad,2))/(bins-1)
+    @staticmethod
+    def _scanArrays(padSize, occupancy, padScale: float = 1):
+        """Arrays of a pad size scan, with the pad sizes scaled by padScale"""
+        padSize = numpy.asarray(padSize, dtype=numpy.float64) * padScale
+        occupancy = numpy.asarray(occupancy, dtype=numpy.float64)
+        return padSize, occupancy
 
-        for ibin in range(bins):
-            if doLog:
-                padSize += [2**(ibin * step + log(minPad,2))]
-            else:
-                padSize += [ibin * step + minPad]
-            occupancy += [self.integratePadOccupancy(padSize[ibin], padSize[ibin])]
+    @staticmethod
+    def _scanGraph(padSize, occupancy):
+        """TGraph of the arrays of a pad size scan"""
+        from .exports import toTGraph
+
+        undefined = numpy.isnan(occupancy)
+        if undefined.any():
+            print("There were {} not defined occupancies, using the value 0 to avoid a crash".format(int(undefined.sum())))
+            occupancy = numpy.where(undefined, 0.0, occupancy)
 
-        return (padSize,occupancy)
+        return toTGraph(padSize, occupancy)
 
     def squarePadPeakUniformGraph(
             self,
@@ -521,25 +937,7 @@ class PPSHitmap:
             padScale: float = 1,
             doLog: bool = False,
                                   ):
-        from ROOT import TGraph  # type: ignore
-
-        from array import array
-        (padSize, occupancy) = self.squarePadPeakUniformScan(bins, minPad, maxPad, doLog = doLog)
-        for ibin in range(len(padSize)):
-            padSize[ibin] = padSize[ibin] * padScale
-
-        x, y = array( 'd' ), array( 'd' )
-        graph = TGraph()
-        for ibin in range(len(padSize)):
-            x.append(padSize[ibin])
-            if occupancy[ibin] is not None:
-                y.append(occupancy[ibin])
-            else:
-                y.append(0)
-                print("There was a not defined occupancy, using the value 0 to avoid a crash")
-            graph = TGraph(bins, x, y)
-
-        return graph
+        return self._scanGraph(*self._scanArrays(*self.squarePadPeakUniformScan(bins, minPad, maxPad, doLog = doLog), padScale))
 
     def squarePadIntegrateGraph(
             self,
@@ -549,26 +947,19 @@ class PPSHitmap:
             padScale: float = 1,
             doLog: bool = False,
                                 ):
-        from ROOT import TGraph  # type: ignore
-        from array import array
-
-        (padSize, occupancy) = self.squarePadIntegrateScan(bins, minPad, maxPad, doLog = doLog)
-        padSize = [pad*padScale for pad in padSize]
-
-        x, y = array( 'd' ), array( 'd' )
-        graph = TGraph()
-        for ibin in range(len(padSize)):
-            x.append(padSize[ibin])
-            if occupancy[ibin] is not None:
-                y.append(occupancy[ibin])
-            else:
-                y.append(0)
-                print("There was a not defined occupancy, using the value 0 to avoid a crash")
-            graph = TGraph(bins, x, y)
+        return self._scanGraph(*self._scanArrays(*self.squarePadIntegrateScan(bins, minPad, maxPad, doLog = doLog), padScale))
 
-        return graph
+    def _pointsScanRange(self, minPadSize: float, maxPadSize: float, pointStepping: int):
+        """Number of bins and range of the scan with pad sizes multiple of the hitmap step"""
+        from math import ceil, floor
 
-    def squarePadOccupancy(
+        pointsMinSize = ceil(minPadSize/self.xStep)*self.xStep
+        pointsBins = floor((maxPadSize - pointsMinSize)/(self.xStep*pointStepping)) + 1
+        pointsMaxSize = pointsMinSize + self.xStep * pointStepping * (pointsBins - 1)
+
+        return pointsBins, pointsMinSize, pointsMaxSize
+
+    def squarePadOccupancyArrays(
             self,
             minPadSize: float = 1e-6,
             maxPadSize: float = 1e-2,
@@ -576,24 +967,32 @@ class PPSHitmap:
             doLog: bool = True,
             lengthScale: float = 1.0e6,
             pointStepping: int = 2,
-                           ):
-
-        from math import ceil, floor
-
-        pointsMinSize = ceil(minPadSize/self.xStep)*self.xStep
-        pointsBins = floor((maxPadSize - pointsMinSize)/(self.xStep*pointStepping)) + 1
-        pointsMaxSize = pointsMinSize + self.xStep * pointStepping * (pointsBins - 1)
-
-        uniformGraph   = self.squarePadPeakUniformGraph(steps, minPadSize, maxPadSize, padScale = lengthScale, doLog = doLog)
-        integrateGraph = self.squarePadIntegrateGraph(steps, minPadSize, maxPadSize, padScale = lengthScale, doLog = doLog)
-        pointsGraph    = self.squarePadIntegrateGraph(pointsBins, pointsMinSize, pointsMaxSize, padScale = lengthScale)
+                                 ):
+        """
+        The scans shown by squarePadOccupancy, as a dictionary with the (padSize, occupancy) arrays of the 'uniform',
+        'integrate' and 'points' scans, the pad sizes scaled by lengthScale and the undefined occupancies as NaN.
+        """
+        pointsBins, pointsMinSize, pointsMaxSize = self._pointsScanRange(minPadSize, maxPadSize, pointStepping)
 
         return {
-            'uniform': uniformGraph,
-            'integrate': integrateGraph,
-            'points': pointsGraph,
+            'uniform': self._scanArrays(*self.squarePadPeakUniformScan(steps, minPadSize, maxPadSize, doLog = doLog), lengthScale),
+            'integrate': self._scanArrays(*self.squarePadIntegrateScan(steps, minPadSize, maxPadSize, doLog = doLog), lengthScale),
+            'points': self._scanArrays(*self.squarePadIntegrateScan(pointsBins, pointsMinSize, pointsMaxSize), lengthScale),
         }
 
+    def squarePadOccupancy(
+            self,
+            minPadSize: float = 1e-6,
+            maxPadSize: float = 1e-2,
+            steps: int = 50,
+            doLog: bool = True,
+            lengthScale: float = 1.0e6,
+            pointStepping: int = 2,
+                           ):
+        scans = self.squarePadOccupancyArrays(minPadSize, maxPadSize, steps = steps, doLog = doLog, lengthScale = lengthScale, pointStepping = pointStepping)
+
+        return {key: self._scanGraph(*scan) for key, scan in scans.items()}
+
     def rectangularPadPeakUniformScan(
             self,
             bins: int,
@@ -603,34 +1002,20 @@ class PPSHitmap:
             xLen : float | None = None,
             yLen : float | None = None,
                                  ):
-        if bins <= 1:
-            raise ValueError("You must set 2 or more bins for the bin integration")
-        if doLog and minPad == 0:
-            raise ValueError("You can not set the minimum to 0 when using a logarithm scale")
-        if xLen is None and yLen is None:
-            raise RuntimeError("You must specify a fixed value for either the x length of the pad or the y length of the pad, none was set")
-        if xLen is not None and yLen is not None:
-            raise RuntimeError("You must specify a fixed value for either the x length of the pad or the y length of the pad, both were set")
-
-        from math import log
-        padSize = []
-        occupancy = []
-
-        step = (maxPad - minPad)/(bins-1)
-        if doLog:
-            step = (log(maxPad,2) - log(minPad,2))/(bins-1)
-
-        for ibin in range(bins):
-            if doLog:
-                padSize += [2**(ibin * step + log(minPad,2))]
-            else:
-                padSize += [ibin * step + minPad]
-            if xLen is not None:
-                occupancy += [self.peakUniformPadOccupancy(xLen, padSize[ibin])]
-            if yLen is not None:
-                occupancy += [self.peakUniformPadOccupancy(padSize[ibin], yLen)]
+        """
+        Occupancy of a rectangular pad on the peak fluence, with one side fixed to xLen or yLen and bins sizes of the
+        other side, returns the (padSize, occupancy) arrays
+        """
+        self._checkFixedLength(xLen, yLen)
+        padSize = self._scanPadSizes(bins, minPad, maxPad, doLog)
+        if xLen is not None:
+            occupancy = self.peakUniformPadOccupancy(xLen, padSize)
+        else:
+            occupancy = self.peakUniformPadOccupancy(padSize, yLen)
+        if occupancy is None:
+            occupancy = numpy.full(bins, numpy.nan)
 
-        return (padSize,occupancy)
+        return (padSize, occupancy)
 
     def rectangularPadIntegrateScan(
             self,
@@ -641,34 +1026,18 @@ class PPSHitmap:
             xLen : float | None = None,
             yLen : float | None = None,
                                ):
-        if bins <= 1:
-            raise ValueError("You must set 2 or more bins for the bin integration")
-        if doLog and minPad == 0:
-            raise ValueError("You can not set the minimum to 0 when using a logarithm scale")
-        if xLen is None and yLen is None:
-            raise RuntimeError("You must specify a fixed value for either the x length of the pad or the y length of the pad, none was set")
-        if xLen is not None and yLen is not None:
-            raise RuntimeError("You must specify a fixed value for either the x length of the pad or the y length of the pad, both were set")
-
-        from math import log
-        padSize = []
-        occupancy = []
-
-        step = (maxPad - minPad)/(bins-1)
-        if doLog:
-            step = (log(maxPad,2) - log(minPad,2))/(bins-1)
-
-        for ibin in range(bins):
-            if doLog:
-                padSize += [2**(ibin * step + log(minPad,2))]
-            else:
-                padSize += [ibin * step + minPad]
-            if xLen is not None:
-                occupancy += [self.integratePadOccupancy(xLen, padSize[ibin])]
-            if yLen is not None:
-                occupancy += [self.integratePadOccupancy(padSize[ibin], yLen)]
+        """
+        Integrated occupancy of a rectangular pad at the peak, with one side fixed to xLen or yLen and bins sizes of
+        the other side, returns the (padSize, occupancy) arrays
+        """
+        self._checkFixedLength(xLen, yLen)
+        padSize = self._scanPadSizes(bins, minPad, maxPad, doLog)
+        if xLen is not None:
+            occupancy = self.integratePadOccupancy(xLen, padSize)
+        else:
+            occupancy = self.integratePadOccupancy(padSize, yLen)
 
-        return (padSize,occupancy)
+        return (padSize, occupancy)
 
     def rectangularPadPeakUniformGraph(
             self,
@@ -680,25 +1049,7 @@ class PPSHitmap:
             xLen : float | None = None,
             yLen : float | None = None,
                                   ):
-        from ROOT import TGraph  # type: ignore
-
-        from array import array
-        (padSize, occupancy) = self.rectangularPadPeakUniformScan(bins, minPad, maxPad, doLog = doLog, xLen = xLen, yLen = yLen)
-        for ibin in range(len(padSize)):
-            padSize[ibin] = padSize[ibin] * padScale
-
-        x, y = array( 'd' ), array( 'd' )
-        graph = TGraph()
-        for ibin in range(len(padSize)):
-            x.append(padSize[ibin])
-            if occupancy[ibin] is not None:
-                y.append(occupancy[ibin])
-            else:
-                y.append(0)
-                print("There was a not defined occupancy, using the value 0 to avoid a crash")
-            graph = TGraph(bins, x, y)
-
-        return graph
+        return self._scanGraph(*self._scanArrays(*self.rectangularPadPeakUniformScan(bins, minPad, maxPad, doLog = doLog, xLen = xLen, yLen = yLen), padScale))
 
     def rectangularPadIntegrateGraph(
             self,
@@ -710,24 +1061,31 @@ class PPSHitmap:
             xLen : float | None = None,
             yLen : float | None = None,
                                 ):
-        from ROOT import TGraph  # type: ignore
-        from array import array
-
-        (padSize, occupancy) = self.rectangularPadIntegrateScan(bins, minPad, maxPad, doLog = doLog, xLen = xLen, yLen = yLen)
-        padSize = [pad*padScale for pad in padSize]
-
-        x, y = array( 'd' ), array( 'd' )
-        graph = TGraph()
-        for ibin in range(len(padSize)):
-            x.append(padSize[ibin])
-            if occupancy[ibin] is not None:
-                y.append(occupancy[ibin])
-            else:
-                y.append(0)
-                print("There was a not defined occupancy, using the value 0 to avoid a crash")
-            graph = TGraph(bins, x, y)
+        return self._scanGraph(*self._scanArrays(*self.rectangularPadIntegrateScan(bins, minPad, maxPad, doLog = doLog, xLen = xLen, yLen = yLen), padScale))
 
-        return graph
+    def rectangularPadOccupancyArrays(
+            self,
+            minPadSize: float = 1e-6,
+            maxPadSize: float = 1e-2,
+            steps: int = 50,
+            doLog: bool = True,
+            lengthScale: float = 1.0e6,
+            pointStepping: int = 2,
+            xLen : float | None = None,
+            yLen : float | None = None,
+                                      ):
+        """
+        The scans shown by rectangularPadOccupancy, as a dictionary with the (padSize, occupancy) arrays of the
+        'uniform', 'integrate' and 'points' scans, the pad sizes scaled by lengthScale and the undefined occupancies
+        as NaN.
+        """
+        pointsBins, pointsMinSize, pointsMaxSize = self._pointsScanRange(minPadSize, maxPadSize, pointStepping)
+
+        return {
+            'uniform': self._scanArrays(*self.rectangularPadPeakUniformScan(steps, minPadSize, maxPadSize, doLog = doLog, xLen = xLen, yLen = yLen), lengthScale),
+            'integrate': self._scanArrays(*self.rectangularPadIntegrateScan(steps, minPadSize, maxPadSize, doLog = doLog, xLen = xLen, yLen = yLen), lengthScale),
+            'points': self._scanArrays(*self.rectangularPadIntegrateScan(pointsBins, pointsMinSize, pointsMaxSize, xLen = xLen, yLen = yLen), lengthScale),
+        }
 
     def rectangularPadOccupancy(
             self,
@@ -740,19 +1098,6 @@ class PPSHitmap:
             xLen : float | None = None,
             yLen : float | None = None,
                            ):
+        scans = self.rectangularPadOccupancyArrays(minPadSize, maxPadSize, steps = steps, doLog = doLog, lengthScale = lengthScale, pointStepping = pointStepping, xLen = xLen, yLen = yLen)
 
-        from math import ceil, floor
-
-        pointsMinSize = ceil(minPadSize/self.xStep)*self.xStep
-        pointsBins = floor((maxPadSize - pointsMinSize)/(self.xStep*pointStepping)) + 1
-        pointsMaxSize = pointsMinSize + self.xStep * pointStepping * (pointsBins - 1)
-
-        uniformGraph   = self.rectangularPadPeakUniformGraph(steps, minPadSize, maxPadSize, padScale = lengthScale, doLog = doLog, xLen = xLen, yLen = yLen)
-        integrateGraph = self.rectangularPadIntegrateGraph(steps, minPadSize, maxPadSize, padScale = lengthScale, doLog = doLog, xLen = xLen, yLen = yLen)
-        pointsGraph    = self.rectangularPadIntegrateGraph(pointsBins, pointsMinSize, pointsMaxSize, padScale = lengthScale, xLen = xLen, yLen = yLen)
-
-        return {
-            'uniform': uniformGraph,
-            'integrate': integrateGraph,
-            'points': pointsGraph,
-        }
+        return {key: self._scanGraph(*scan) for key, scan in scans.items()}
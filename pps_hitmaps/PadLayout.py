@@ -0,0 +1,191 @@
+#############################################################################
+# zlib License
+#
+# (C) 2023 Cristóvão Beirão da Cruz e Silva <cbeiraod@cern.ch>
+#
+# This software is provided 'as-is', without any express or implied
+# warranty.  In no event will the authors be held liable for any damages
+# arising from the use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose,
+# including commercial applications, and to alter it and redistribute it
+# freely, subject to the following restrictions:
+#
+# 1. The origin of this software must not be misrepresented; you must not
+#    claim that you wrote the original software. If you use this software
+#    in a product, an acknowledgment in the product documentation would be
+#    appreciated but is not required.
+# 2. Altered source versions must be plainly marked as such, and must not be
+#    misrepresented as being the original software.
+# 3. This notice may not be removed or altered from any source distribution.
+#############################################################################
+
+from __future__ import annotations
+
+from fractions import Fraction
+
+import numpy
+
+class PadTable:
+    """
+    Struct of arrays description of the pads of a sensor, in mm: the pad rectangles and the extra space around each
+    pad for considering the interpad distance, all arrays of shape (numPads,).
+    """
+    def __init__(self, minX, maxX, minY, maxY, extraX = 0, extraY = 0):
+        self.minX = numpy.asarray(minX, dtype=numpy.float64)
+        self.maxX = numpy.asarray(maxX, dtype=numpy.float64)
+        self.minY = numpy.asarray(minY, dtype=numpy.float64)
+        self.maxY = numpy.asarray(maxY, dtype=numpy.float64)
+        self.extraX = numpy.broadcast_to(numpy.asarray(extraX, dtype=numpy.float64), self.minX.shape).copy()
+        self.extraY = numpy.broadcast_to(numpy.asarray(extraY, dtype=numpy.float64), self.minX.shape).copy()
+
+        for array in [self.maxX, self.minY, self.maxY]:
+            if array.shape != self.minX.shape or array.ndim != 1:
+                raise ValueError("The pad table arrays must all have the same shape (numPads,)")
+
+    def __len__(self):
+        return len(self.minX)
+
+    @classmethod
+    def concatenate(cls, tables: list[PadTable]):
+        """Table with the pads of all the tables, in order"""
+        columns = [numpy.concatenate([getattr(table, key) for table in tables]) if len(tables) > 0 else [] for key in ["minX", "maxX", "minY", "maxY", "extraX", "extraY"]]
+        return cls(*columns)
+
+    def take(self, indices):
+        """Table with the selected pads, in the given order"""
+        return PadTable(*[getattr(self, key)[indices] for key in ["minX", "maxX", "minY", "maxY", "extraX", "extraY"]])
+
+    def transpose(self):
+        """Table with the x and y axes swapped"""
+        return PadTable(self.minY, self.maxY, self.minX, self.maxX, self.extraY, self.extraX)
+
+    def geometry(self):
+        """Pad rectangles as a dictionary of arrays, with the same names as the SensorPad properties"""
+        return {
+            "minX": self.minX,
+            "maxX": self.maxX,
+            "minY": self.minY,
+            "maxY": self.maxY,
+            "minX_extra": self.minX - self.extraX,
+            "maxX_extra": self.maxX + self.extraX,
+            "minY_extra": self.minY - self.extraY,
+            "maxY_extra": self.maxY + self.extraY,
+        }
+
+    def toPads(self, epochs: int = 1):
+        """Build the SensorPad objects of the pads"""
+        from .SensorPad import SensorPad
+
+        columns = zip(self.minX.tolist(), self.maxX.tolist(), self.minY.tolist(), self.maxY.tolist(), self.extraX.tolist(), self.extraY.tolist())
+        return [SensorPad(epochs = epochs, minX=minX, maxX=maxX, minY=minY, maxY=maxY, extra_x=extraX, extra_y=extraY) for minX, maxX, minY, maxY, extraX, extraY in columns]
+
+class PadColumn:
+    """
+    One column of a pad layout, in units of the pad pitch:
+      - width: width of the column, may be a fraction of the pitch (e.g. Fraction(1, 2))
+      - rows: number of rows of pads per pitch along y
+      - subColumns: number of pads side by side in each row
+      - padHeight: if set, the pads have this height in mm and are centered in their row, instead of filling the row
+                   minus the interpad distance
+      - extraY: extra space above and below the pads in mm, by default half the interpad distance
+    """
+    def __init__(self, width = 1, rows: int = 1, subColumns: int = 1, padHeight: float | None = None, extraY: float | None = None):
+        self.width = Fraction(width)
+        self.rows = int(rows)
+        self.subColumns = int(subColumns)
+        self.padHeight = padHeight
+        self.extraY = extraY
+
+        if self.width <= 0:
+            raise ValueError("The column width must be positive")
+        if self.rows < 1 or self.subColumns < 1:
+            raise ValueError("A column must have at least one row and one sub-column")
+
+class PadLayout:
+    """
+    Declarative description of a sensor as a sequence of pad columns, from left to right, on a grid with the pad
+    size as pitch. The pads are ordered by column, then by row from the bottom, then by sub-column, and the sensitive
+    area is centered at the origin with the guard ring around it.
+    """
+    def __init__(self, columns: list[PadColumn], height = 16, padSize: float = 1.3, padSpacing: float = 0.1, guardRing: float = 0.3, transpose: bool = False):
+        """
+        columns - the columns of the layout
+        height - height of the sensor in units of the pad pitch
+        padSize - pad pitch, the design size of the pads neglecting the interpad distance
+        padSpacing - the interpad distance
+        guardRing - the size of the guard ring
+        transpose - swap the x and y axes, so the columns become rows
+        """
+        self.columns = list(columns)
+        self.height = int(height)
+        self.padSize = padSize
+        self.padSpacing = padSpacing
+        self.guardRing = guardRing
+        self.transpose = transpose
+
+        if len(self.columns) == 0:
+            raise ValueError("A pad layout needs at least one column")
+
+    @property
+    def width(self):
+        """Width of the sensor in units of the pad pitch"""
+        return sum(column.width for column in self.columns)
+
+    def sensorSize(self):
+        """Size of the sensor along x and y, in mm"""
+        sizeX = self.padSize*float(self.width) + 2*self.guardRing - self.padSpacing
+        sizeY = self.padSize*self.height + 2*self.guardRing - self.padSpacing
+        if self.transpose:
+            return sizeY, sizeX
+        return sizeX, sizeY
+
+    def table(self):
+        """Build the pad table of the layout"""
+        padSize = self.padSize
+        halfSpacing = self.padSpacing/2
+        originX = -padSize*float(self.width/2)
+        originY = -padSize*(self.height/2)
+
+        # Edges of the sub-columns along x, from the fractions of the pitch, one entry per sub-column
+        subMinX = []
+        subMaxX = []
+        start = Fraction(0)
+        for column in self.columns:
+            edges = [start + column.width*idx/column.subColumns for idx in range(column.subColumns + 1)]
+            subMinX += [originX + edge.numerator*padSize/edge.denominator + halfSpacing for edge in edges[:-1]]
+            subMaxX += [originX + edge.numerator*padSize/edge.denominator - halfSpacing for edge in edges[1:]]
+            start += column.width
+        subMinX = numpy.array(subMinX)
+        subMaxX = numpy.array(subMaxX)
+
+        # Per column quantities
+        subColumns = numpy.array([column.subColumns for column in self.columns])
+        rowsPerPitch = numpy.array([column.rows for column in self.columns])
+        padHeight = numpy.array([numpy.nan if column.padHeight is None else column.padHeight for column in self.columns], dtype=numpy.float64)
+        extraY = numpy.array([halfSpacing if column.extraY is None else column.extraY for column in self.columns], dtype=numpy.float64)
+        numRows = self.height*rowsPerPitch
+        subStart = numpy.cumsum(subColumns) - subColumns
+        counts = numRows*subColumns
+
+        # Pads ordered by column, then row, then sub-column
+        columnIdx = numpy.repeat(numpy.arange(len(self.columns)), counts)
+        localIdx = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        rowIdx = localIdx//subColumns[columnIdx]
+        subIdx = subStart[columnIdx] + localIdx%subColumns[columnIdx]
+        rows = rowsPerPitch[columnIdx]
+
+        minY = originY + rowIdx*padSize/rows + halfSpacing
+        maxY = originY + (rowIdx + 1)*padSize/rows - halfSpacing
+        centered = ~numpy.isnan(padHeight[columnIdx])
+        if centered.any():
+            # Pads of a given height centered in their row
+            centerY = originY + (rowIdx + 0.5)*padSize/rows
+            minY = numpy.where(centered, centerY - padHeight[columnIdx]/2, minY)
+            maxY = numpy.where(centered, centerY + padHeight[columnIdx]/2, maxY)
+
+        table = PadTable(subMinX[subIdx], subMaxX[subIdx], minY, maxY, halfSpacing, extraY[columnIdx])
+        if self.transpose:
+            # The rows become columns, keep the pads ordered by column and then by row
+            table = table.transpose().take(numpy.lexsort((columnIdx, rowIdx)))
+        return table
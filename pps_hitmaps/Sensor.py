@@ -24,22 +24,77 @@ from __future__ import annotations
 
 from .ClassFields import *
 from .PPSHitmap import PPSHitmap
+from .PadLayout import PadLayout
+from .PadLayout import PadTable
 from .SensorPad import SensorPad
+from .SensorPad import calculatePadFluxes
+from .SensorPad import calculateVoltageWindows
+from .SensorPad import combineVoltageWindows
+from .ToyResults import ToyResults
 
-import pandas
 import numpy
-import hist
-import matplotlib
-import matplotlib.pyplot as plt
-import mplhep
 from math import ceil
 
 def calcLossProb(deadtime, occupancy, bunchSpacing=25.):
-    from math import exp, floor
-    timeStep = floor(deadtime/float(bunchSpacing))
-    return 1 - (occupancy ** 2)/((1 - exp(-occupancy))**2) * exp(-2*occupancy * (timeStep + 1))
-
-# TODO: Check what is using so much memory
+    from .functions import calcEventLossProb
+    timeStep = numpy.floor(numpy.asarray(deadtime)/float(bunchSpacing))
+    return calcEventLossProb(timeStep, occupancy)
+
+class _PadGroups:
+    """
+    Index of the group of each pad, with the pads sorted by group so per group reductions are single reduceat calls.
+    """
+    def __init__(self, labels: list, index: numpy.ndarray):
+        self.labels = list(labels)
+        self.index = numpy.asarray(index, dtype=numpy.intp)
+        self.counts = numpy.bincount(self.index, minlength=len(self.labels))
+        self.order = numpy.argsort(self.index, kind="stable")
+        self.starts = numpy.concatenate([[0], numpy.cumsum(self.counts)[:-1]]).astype(numpy.intp)
+
+    def pads(self, groupIdx: int):
+        """Indices of the pads in a group, in padVec order"""
+        return self.order[self.starts[groupIdx]:self.starts[groupIdx] + self.counts[groupIdx]]
+
+    def reduce(self, ufunc, values, axis: int = 0, dtype = None):
+        """
+        Reduce values along the pad axis within each group with a numpy ufunc (e.g. numpy.add, numpy.maximum).
+        The pad axis is replaced by a group axis, empty groups get the ufunc identity, or NaN if it has none.
+        """
+        values = numpy.moveaxis(numpy.asarray(values), axis, -1)[..., self.order]
+        nonEmpty = self.counts > 0
+        reduced = ufunc.reduceat(values, self.starts[nonEmpty], axis=-1, dtype=dtype)
+        if not nonEmpty.all():
+            fill = ufunc.identity if ufunc.identity is not None else numpy.nan
+            result = numpy.full(reduced.shape[:-1] + (len(self.labels),), fill, dtype=numpy.result_type(reduced.dtype, fill))
+            result[..., nonEmpty] = reduced
+            reduced = result
+        return numpy.moveaxis(reduced, -1, axis)
+
+def _drawToys(rng, occupancy, groups: _PadGroups, numToys: int, keepHitmap: bool):
+    """
+    Draw the hits of all pads for numToys toys, rng being a numpy Generator or a SeedSequence to build one from.
+    Returns the event loss flags and number of active pads for the whole sensor (category "") and per group, and the
+    uint8 hits if requested.
+    """
+    if isinstance(rng, numpy.random.SeedSequence):
+        rng = numpy.random.default_rng(rng)
+
+    hits = rng.poisson(occupancy, size=(numToys, len(occupancy)))
+    singleHits = hits >= 1
+    multiHits = hits >= 2
+
+    padsType = numpy.min_scalar_type(len(occupancy))
+    groupEventLoss = groups.reduce(numpy.logical_or, multiHits, axis=1)
+    groupActivePads = groups.reduce(numpy.add, singleHits, axis=1, dtype=numpy.intp)
+
+    eventLoss = {"": multiHits.any(axis=1)}
+    activePads = {"": numpy.count_nonzero(singleHits, axis=1).astype(padsType)}
+    for groupIdx, label in enumerate(groups.labels):
+        eventLoss[label] = groupEventLoss[:, groupIdx]
+        activePads[label] = groupActivePads[:, groupIdx].astype(padsType)
+    hits = numpy.minimum(hits, 255).astype(numpy.uint8) if keepHitmap else None
+
+    return eventLoss, activePads, hits
 
 class Sensor:
     numPads = NonNegativeIntField()
@@ -48,11 +103,10 @@ class Sensor:
     maxX = FloatField()
     minY = FloatField()
     maxY = FloatField()
-    padVec : list[SensorPad]
-
     def __init__(self, shifts:list = []):
         self.shifts = shifts
         self.numPads = 0
+        self._padTable = None
         self.padVec = []
 
         self.minX = 0
@@ -61,61 +115,274 @@ class Sensor:
         self.maxY = 0
 
         self.hasFlux = False
+        self.fluxArrays = None
         self._hist_stepping = None
 
+    @property
+    def padVec(self):
+        """The SensorPad objects, built on first use for sensors described by a pad table"""
+        if self._padVec is None:
+            self._padVec = self._padTable.toPads(len(self.shifts))
+        return self._padVec
+
+    @padVec.setter
+    def padVec(self, padVec: list[SensorPad]):
+        self._padVec = padVec
+        self._padTable = None
+        self._padGroupCache = {}
+
+    @property
+    def padTable(self):
+        """The pad table the pads were built from, None if padVec was filled directly"""
+        return self._padTable
+
+    @padTable.setter
+    def padTable(self, padTable: PadTable):
+        if not isinstance(padTable, PadTable):
+            raise ValueError("expecting a PadTable")
+        self._padTable = padTable
+        self._padVec = None
+        self._padGroupCache = {}
+        self.numPads = len(padTable)
+        self.hasFlux = False
+
+    def setLayout(self, layout: PadLayout):
+        """Set the pads and the sensor size from a pad layout"""
+        sizeX, sizeY = layout.sensorSize()
+
+        self.minX =-sizeX/2
+        self.maxX = sizeX/2
+        self.minY =-sizeY/2
+        self.maxY = sizeY/2
+
+        self.padTable = layout.table()
+
+    def _padCount(self):
+        if self._padVec is None:
+            return len(self._padTable)
+        return len(self._padVec)
+
     def _getAllPadCategories(self):
         return ["all"]
 
+    def _getPadCategories(self):
+        """Category of each pad, in padVec order"""
+        return [self._getPadCategory(padID) for padID in range(self._padCount())]
+
     def _getPadCategory(self, padID):
         return "all"
 
-    def simulateToys(self, numToys: int = 1000, seed: int | None = None):
-        rng = numpy.random.default_rng(seed = seed)
-        toyCache = []
-
-        all_categories = self._getAllPadCategories()
-        extra_cols = []
-        for cat in all_categories:
-            extra_cols += ["event_loss_"+cat, "active_pads_"+cat, "sensor_occupancy_"+cat, "bit_length_"+cat]
+    def simulateToys(self, numToys: int = 1000, seed: int | None = None, chunkSize: int = 10000, keepHitmap: bool = True, numWorkers: int | None = None, grouping = None):
+        """
+        Monte Carlo of the number of hits per pad, returns one ToyResults per shift position.
+        The hits of all pads are drawn at once for chunkSize toys, so memory stays bounded for large numbers of toys.
+        The hits per pad are kept as a uint8 matrix, they can be dropped with keepHitmap = False.
+        Use ToyResults.toDataFrame to get the full dataframe.
+
+        By default a single random stream is used, giving the same values as drawing pad by pad, toy by toy, for a
+        given seed. With numWorkers, the shift positions and chunks of toys are spread over a pool of processes, each
+        with its own stream spawned from the seed, so the results only depend on the seed and chunkSize and not on the
+        number of workers (numWorkers = 1 runs the same streams in this process).
+        The per category columns follow the pad categories, or any other grouping accepted by padGroups.
+        """
+        if chunkSize <= 0:
+            raise ValueError("The chunk size must be positive")
+        if numWorkers is not None and numWorkers <= 0:
+            raise ValueError("The number of workers must be positive")
+
+        numPads = len(self.padVec)
+        numEpochs = len(self.shifts)
+        groups = self.padGroups(grouping)
+        catNumPads = {"": numPads}
+        for groupIdx, label in enumerate(groups.labels):
+            catNumPads[label] = int(groups.counts[groupIdx])
+        padsType = numpy.min_scalar_type(numPads)
+        occupancy = [numpy.array([pad.doses[epoch]["occupancy"] for pad in self.padVec], dtype=numpy.float64) for epoch in range(numEpochs)]
+        chunks = [(first, min(first + chunkSize, numToys)) for first in range(0, numToys, chunkSize)]
+
+        if numWorkers is None:
+            rng = numpy.random.default_rng(seed = seed)
+            # Drawn lazily, one chunk at a time, while filling the results below
+            results = ((_drawToys(rng, occupancy[epoch], groups, last - first, keepHitmap) for first, last in chunks) for epoch in range(numEpochs))
+        else:
+            epochSeeds = numpy.random.SeedSequence(seed).spawn(numEpochs)
+            tasks = [(epochSeeds[epoch].spawn(len(chunks)), epoch) for epoch in range(numEpochs)]
+            tasks = [(chunkSeeds[chunkIdx], occupancy[epoch], groups, last - first, keepHitmap) for chunkSeeds, epoch in tasks for chunkIdx, (first, last) in enumerate(chunks)]
+            if numWorkers == 1:
+                flatResults = [_drawToys(*task) for task in tasks]
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers = numWorkers) as executor:
+                    flatResults = list(executor.map(_drawToys, *zip(*tasks)))
+            results = [flatResults[epoch*len(chunks):(epoch + 1)*len(chunks)] for epoch in range(numEpochs)]
 
-        for epoch in range(len(self.shifts)):
-            data = []
-            for toyIdx in range(numToys):
-                extra_col_data = []
-                hits = []
-                hits_per_cat = {}
-                for cat in all_categories:
-                    hits_per_cat[cat] = []
-
-                for padID in range(len(self.padVec)):
-                    pad = self.padVec[padID]
-                    pad_hits = rng.poisson(pad.doses[epoch]["occupancy"])
-                    hits += [pad_hits]
-                    pad_cat = self._getPadCategory(padID)
-                    hits_per_cat[pad_cat] += [pad_hits]
-
-                singleHits = [1 if hit >= 1 else 0 for hit in hits]
-                eventLoss = any([True if hit >= 2 else False for hit in hits])
-                activePads = sum(singleHits)
-                sensorOccupancy = float(activePads)/len(self.padVec)
-                bitLength = 40 * (activePads + 2)  # We add 2 because each event needs a header and a trailer and each data word is 40 bits
-
-                for cat in all_categories:
-                    catSingleHits = [1 if hit >= 1 else 0 for hit in hits_per_cat[cat]]
-                    catEventLoss = any([True if hit >= 2 else False for hit in hits_per_cat[cat]])
-                    catActivePads = sum(catSingleHits)
-                    catSensorOccupancy = float(catActivePads)/len(hits_per_cat[cat])
-                    catBitLength = 40 * (catActivePads + 2)
-
-                    extra_col_data += [catEventLoss, catActivePads, catSensorOccupancy*100, catBitLength]
-
-                data += [[toyIdx, f'{hits}'[1:-1], eventLoss, activePads, sensorOccupancy*100, bitLength]+extra_col_data]
-            toyCache += [pandas.DataFrame(data, columns=['event', 'hitmap', 'event_loss', 'active_pads', 'sensor_occupancy', 'bit_length']+extra_cols)]
-            del data
+        toyCache = []
+        for epochResults in results:
+            eventLoss = {cat: numpy.zeros(numToys, dtype=bool) for cat in catNumPads}
+            activePads = {cat: numpy.zeros(numToys, dtype=padsType) for cat in catNumPads}
+            hitmap = numpy.zeros((numToys, numPads), dtype=numpy.uint8) if keepHitmap else None
+            for (first, last), (chunkEventLoss, chunkActivePads, chunkHits) in zip(chunks, epochResults):
+                for cat in catNumPads:
+                    eventLoss[cat][first:last] = chunkEventLoss[cat]
+                    activePads[cat][first:last] = chunkActivePads[cat]
+                if keepHitmap:
+                    hitmap[first:last] = chunkHits
+
+            toyCache += [ToyResults(eventLoss, activePads, catNumPads, hitmap)]
 
         return toyCache
 
-    def plotToyInfo(self, toyCache: list[pandas.DataFrame], column: str, minX: float, maxX: float, bins: int, title: str, label: str = None):
+    def padGroups(self, grouping = None):
+        """
+        Group index of the pads, by default the pad categories. A grouping can also be a function of the pad ID
+        returning its group label (e.g. the readout chip), or a sequence with the label of each pad.
+        The index is cached for the pad categories and for functions, it is rebuilt when the pads change.
+        """
+        numPads = self._padCount()
+        if grouping is not None and not callable(grouping):
+            padLabels = list(grouping)
+            if len(padLabels) != numPads:
+                raise ValueError("The grouping must have one label per pad")
+            return self._buildPadGroups([], padLabels)
+
+        signature = (id(self._padTable),) if self._padVec is None else tuple(map(id, self._padVec))
+        cached = self._padGroupCache.get(grouping)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        if grouping is None:
+            groups = self._buildPadGroups(self._getAllPadCategories(), self._getPadCategories())
+        else:
+            groups = self._buildPadGroups([], [grouping(padID) for padID in range(numPads)])
+        self._padGroupCache[grouping] = (signature, groups)
+
+        return groups
+
+    @staticmethod
+    def _buildPadGroups(labels: list, padLabels: list):
+        labelIdx = {label: idx for idx, label in enumerate(labels)}
+        for label in padLabels:
+            if label not in labelIdx:
+                labelIdx[label] = len(labelIdx)
+        return _PadGroups(list(labelIdx), [labelIdx[label] for label in padLabels])
+
+    def reducePads(self, values, ufunc = numpy.add, grouping = None):
+        """
+        Reduce an array with the pads along the first axis, e.g. fluxArrays['occupancy'], within each pad group.
+        Returns a dictionary with the reduced array for each group label.
+        """
+        groups = self.padGroups(grouping)
+        reduced = groups.reduce(ufunc, values, axis=0)
+        return {label: reduced[groupIdx] for groupIdx, label in enumerate(groups.labels)}
+
+    def _occupancyArray(self):
+        """Mean number of hits per pad and per bunch crossing, array of shape (numPads, numEpochs)"""
+        if not self.hasFlux:
+            raise RuntimeError("You must calculate the fluxes before computing the toy distributions")
+        return numpy.array([[pad.doses[epoch]["occupancy"] for epoch in range(len(self.shifts))] for pad in self.padVec], dtype=numpy.float64).reshape(len(self.padVec), len(self.shifts))
+
+    def toyDistributions(self, grouping = None):
+        """
+        Exact distributions of the quantities estimated by simulateToys, the hits per pad being independent Poisson
+        variables. Returns a dictionary with an entry for the whole sensor (category "") and one per pad category, or
+        per group of a grouping accepted by padGroups, with:
+          - 'active_pads': array of shape (numEpochs, numPads+1), probability of k active pads, which is also the
+                           probability of a bit length of 40*(k+2)
+          - 'event_loss': array of shape (numEpochs,), probability of at least one pad with 2 or more hits
+        """
+        occupancy = self._occupancyArray()
+        numEpochs = occupancy.shape[1]
+        padActive = -numpy.expm1(-occupancy) # P(hits >= 1)
+
+        groups = self.padGroups(grouping)
+        eventLoss = self.eventLossProbability(grouping = grouping)
+
+        distributions = {}
+        for groupIdx, cat in [(None, "")] + list(enumerate(groups.labels)):
+            catActive = padActive if groupIdx is None else padActive[groups.pads(groupIdx)]
+
+            # Poisson-binomial distribution, adding one pad at a time
+            activePads = numpy.zeros((numEpochs, len(catActive) + 1), dtype=numpy.float64)
+            activePads[:, 0] = 1
+            for padIdx in range(len(catActive)):
+                prob = catActive[padIdx][:, None]
+                activePads[:, 1:padIdx + 2] = activePads[:, 1:padIdx + 2]*(1 - prob) + activePads[:, 0:padIdx + 1]*prob
+                activePads[:, 0] *= 1 - catActive[padIdx]
+
+            distributions[cat] = {
+                'active_pads': activePads,
+                'event_loss': eventLoss[cat],
+            }
+
+        return distributions
+
+    def eventLossProbability(self, deadtimes = 0, bunchSpacing: float = 25., grouping = None):
+        """
+        Exact event loss probability, for the whole sensor (category "") and per pad category or group, for every
+        shift position and deadtime (in ns). An event is lost when a pad has 2 or more hits within its deadtime, i.e.
+        within floor(deadtime/bunchSpacing) + 1 bunch crossings, so the probability is 1 - prod(p0 + p1) over the pads.
+        Returns a dictionary of arrays of shape (numEpochs,) + numpy.shape(deadtimes).
+        """
+        occupancy = self._occupancyArray()
+        deadtimes = numpy.asarray(deadtimes, dtype=numpy.float64)
+        crossings = numpy.floor(deadtimes/float(bunchSpacing)) + 1
+
+        # log(p0 + p1) for the hits over the deadtime, shape (numPads, numEpochs) + deadtimes.shape
+        meanHits = occupancy.reshape(occupancy.shape + (1,)*deadtimes.ndim) * crossings
+        padNoLoss = -meanHits + numpy.log1p(meanHits)
+
+        groups = self.padGroups(grouping)
+        groupNoLoss = groups.reduce(numpy.add, padNoLoss, axis=0)
+
+        eventLoss = {"": -numpy.expm1(padNoLoss.sum(axis=0))}
+        for groupIdx, label in enumerate(groups.labels):
+            eventLoss[label] = -numpy.expm1(groupNoLoss[groupIdx])
+
+        return eventLoss
+
+    def toySummary(self, numToys: int = 1000, grouping = None):
+        """
+        Exact expectation of the per shift position toy summaries, one dataframe for the whole sensor (category "")
+        and one per pad category (or group), with the same columns as computed from the simulateToys output in the notebooks.
+        The event loss count is the expected count for numToys toys.
+        """
+        import pandas
+
+        padActive = -numpy.expm1(-self._occupancyArray())
+        groups = self.padGroups(grouping)
+        groupMean = groups.reduce(numpy.add, padActive, axis=0)
+        groupVariance = groups.reduce(numpy.add, padActive*(1 - padActive), axis=0)
+
+        summary = {}
+        for cat, dist in self.toyDistributions(grouping).items():
+            if cat == "":
+                numPads = len(padActive)
+                mean = padActive.sum(axis=0)
+                std = numpy.sqrt((padActive*(1 - padActive)).sum(axis=0))
+            else:
+                groupIdx = groups.labels.index(cat)
+                numPads = groups.counts[groupIdx]
+                mean = groupMean[groupIdx]
+                std = numpy.sqrt(groupVariance[groupIdx])
+
+            summary[cat] = pandas.DataFrame({
+                "event_loss_count": dist['event_loss']*numToys,
+                "event_loss_fraction": dist['event_loss'],
+                "active_pads_mean": mean,
+                "active_pads_std": std,
+                "occupancy_mean": mean/numPads*100,
+                "occupancy_std": std/numPads*100,
+                "bit_length_mean": 40*(mean + 2),
+                "bit_length_std": 40*std,
+            })
+
+        return summary
+
+    def plotToyInfo(self, toyCache: list[ToyResults], column: str, minX: float, maxX: float, bins: int, title: str, label: str = None):
+        import hist
+        import matplotlib.pyplot as plt
+        import mplhep
+
         plt.style.use(mplhep.style.CMS)
 
         numTPads = len(self.shifts)
@@ -151,7 +418,7 @@ class Sensor:
 
         return fig
 
-    def plotToyActivePads(self, numToys: int = 1000, toyCache: list[pandas.DataFrame] | None = None):
+    def plotToyActivePads(self, numToys: int = 1000, toyCache: list[ToyResults] | None = None):
         if toyCache is not None:
             numToys = len(toyCache[0])
         else:
@@ -159,7 +426,7 @@ class Sensor:
 
         return self.plotToyInfo(toyCache, "active_pads", 0, 257, 257, "Active Pads", label = "# Active Pads")
 
-    def plotToySensorOccupancy(self, numToys: int = 1000, toyCache: list[pandas.DataFrame] | None = None):
+    def plotToySensorOccupancy(self, numToys: int = 1000, toyCache: list[ToyResults] | None = None):
         if toyCache is not None:
             numToys = len(toyCache[0])
         else:
@@ -167,7 +434,7 @@ class Sensor:
 
         return self.plotToyInfo(toyCache, "sensor_occupancy", 0, 100, 100, "Sensor Occupancy", label = "Sensor Pad Occupancy [%]")
 
-    def plotToyEventSize(self, numToys: int = 1000, toyCache: list[pandas.DataFrame] | None = None):
+    def plotToyEventSize(self, numToys: int = 1000, toyCache: list[ToyResults] | None = None):
         if toyCache is not None:
             numToys = len(toyCache[0])
         else:
@@ -177,56 +444,177 @@ class Sensor:
 
     def setShifts(self, shifts:list):
         self.shifts = shifts
-        for pad in self.padVec:
+        for pad in self._padVec or []:
             pad.setEpochs(len(shifts))
 
         self.hasFlux = False
 
+    def padGeometry(self):
+        """
+        Pad rectangles as arrays of shape (numPads,), in mm, with the same names as the SensorPad properties.
+        Once the pads have been built they are read back, so that any changes to them are taken into account.
+        """
+        if self._padVec is None:
+            return self._padTable.geometry()
+
+        geometry = {}
+        for key in ["minX", "maxX", "minY", "maxY", "minX_extra", "maxX_extra", "minY_extra", "maxY_extra"]:
+            geometry[key] = numpy.array([getattr(pad, key) for pad in self.padVec], dtype=numpy.float64)
+        return geometry
+
+    def _calculatePadFluxes(self, hitmap:PPSHitmap, shifts:list | None = None):
+        if shifts is None:
+            shifts = self.shifts
+        geometry = self.padGeometry()
+
+        fluxes = calculatePadFluxes(hitmap, geometry["minX"], geometry["maxX"], geometry["minY"], geometry["maxY"], shifts)
+        fluxes_extra = calculatePadFluxes(hitmap, geometry["minX_extra"], geometry["maxX_extra"], geometry["minY_extra"], geometry["maxY_extra"], shifts)
+
+        return fluxes, fluxes_extra
+
+    def calculateFluxArrays(self, hitmap:PPSHitmap, shifts:list | None = None):
+        """
+        Batched flux calculation for all pads and all shift positions, without filling the pad doses.
+        Returns a dictionary of arrays of shape (numPads, numEpochs) with the totalFlux, maxFlux and occupancy of the
+        pads, and of the pads including the interpad distance with the _extra suffix.
+        Uses the sensor shifts if none are given.
+        """
+        if not isinstance(hitmap, PPSHitmap):
+            raise ValueError(f'expecting PPSHitmap to calculate the dose')
+
+        fluxes, fluxes_extra = self._calculatePadFluxes(hitmap, shifts)
+
+        return self._mergeFluxArrays(fluxes, fluxes_extra)
+
+    @staticmethod
+    def _mergeFluxArrays(fluxes:dict, fluxes_extra:dict):
+        fluxArrays = {'occupancyNorm': fluxes['occupancyNorm']}
+        for key in ['totalFlux', 'maxFlux', 'occupancy']:
+            fluxArrays[key] = fluxes[key]
+            fluxArrays[key + '_extra'] = fluxes_extra[key]
+        return fluxArrays
+
     def calculateFlux(self, hitmap:PPSHitmap):
         if not isinstance(hitmap, PPSHitmap):
             raise ValueError(f'expecting PPSHitmap to calculate the dose')
 
         hitmap._checkMap()
 
-        for pad in self.padVec:
-            pad.calculateFlux(self.shifts, hitmap) # Remember PPSHitmap is in m, sensor is in mm
+        fluxes, fluxes_extra = self._calculatePadFluxes(hitmap) # Remember PPSHitmap is in m, sensor is in mm
+        for padIdx in range(len(self.padVec)):
+            self.padVec[padIdx]._setDoses(hitmap, fluxes, fluxes_extra, padIdx)
+
+        self.fluxArrays = self._mergeFluxArrays(fluxes, fluxes_extra)
 
         self.hasFlux = True
         self._hist_stepping = hitmap.xStep * hitmap.yStep *1000 *1000  ## Convert m to mm
         # TODO: this function needs to be called before some of the others make sense... add a check
         # Also, modifying the shifts, invalidates previous flux call, so double check that too
 
+    def scanPositions(self, hitmap:PPSHitmap, xs, ys, usePadSpacing=True, deadtime=0, bunchSpacing=25., grouping=None, chunkSize=512):
+        """
+        Evaluate the sensor with its center at every position of the grid xs x ys (in mm), without changing the shifts.
+        Returns a dictionary of arrays of shape (len(xs), len(ys)):
+          - maxOccupancy: occupancy of the hottest pad, and hottestPad its index in padVec
+          - peakFlux: highest pad averaged fluence, in p / (cm^2 fb^-1)
+          - eventLoss: dictionary with the event loss probability for the given deadtime (in ns), for the whole
+                       sensor (category "") and per pad category or group, see eventLossProbability
+        The pads are integrated with the hitmap summed-area table, chunkSize positions at a time.
+        """
+        if not isinstance(hitmap, PPSHitmap):
+            raise ValueError(f'expecting PPSHitmap to scan the sensor positions')
+
+        hitmap._checkMap()
+
+        xs = numpy.asarray(xs, dtype=numpy.float64)
+        ys = numpy.asarray(ys, dtype=numpy.float64)
+        posX, posY = numpy.meshgrid(xs, ys, indexing="ij")
+        posX = posX.ravel()
+        posY = posY.ravel()
+
+        geometry = self.padGeometry()
+        suffix = "" if usePadSpacing else "_extra"
+        minX, maxX = geometry["minX" + suffix][:, None], geometry["maxX" + suffix][:, None]
+        minY, maxY = geometry["minY" + suffix][:, None], geometry["maxY" + suffix][:, None]
+
+        occupancyNorm = (hitmap.xStep *
+                         hitmap.yStep * 1.0E4) # in cm^2
+        binsPerPad = (maxX - minX) * (maxY - minY) / (hitmap.xStep * hitmap.yStep * 1000 * 1000)
+        crossings = numpy.floor(deadtime/float(bunchSpacing)) + 1
+        groups = self.padGroups(grouping)
+
+        maxOccupancy = numpy.zeros(len(posX))
+        hottestPad = numpy.zeros(len(posX), dtype=numpy.intp)
+        peakFlux = numpy.zeros(len(posX))
+        eventLoss = {cat: numpy.zeros(len(posX)) for cat in [""] + groups.labels}
+
+        for first in range(0, len(posX), chunkSize):
+            chunk = slice(first, first + chunkSize)
+            x = posX[None, chunk]
+            y = posY[None, chunk]
+
+            # Shape (numPads, chunk), remember PPSHitmap is in m, sensor is in mm
+            totalFlux = hitmap.integrateFluence((minX + x)/1000, (maxX + x)/1000, (minY + y)/1000, (maxY + y)/1000)
+            occupancy = totalFlux * 1.6E-12 * occupancyNorm
+
+            hottestPad[chunk] = occupancy.argmax(axis=0)
+            maxOccupancy[chunk] = numpy.take_along_axis(occupancy, hottestPad[None, chunk], axis=0)[0]
+            peakFlux[chunk] = (totalFlux/binsPerPad).max(axis=0)
+
+            meanHits = occupancy * crossings
+            padNoLoss = -meanHits + numpy.log1p(meanHits)
+            eventLoss[""][chunk] = -numpy.expm1(padNoLoss.sum(axis=0))
+            groupNoLoss = groups.reduce(numpy.add, padNoLoss, axis=0)
+            for groupIdx, label in enumerate(groups.labels):
+                eventLoss[label][chunk] = -numpy.expm1(groupNoLoss[groupIdx])
+
+        shape = (len(xs), len(ys))
+        return {
+            'x': xs,
+            'y': ys,
+            'maxOccupancy': maxOccupancy.reshape(shape),
+            'hottestPad': hottestPad.reshape(shape),
+            'peakFlux': peakFlux.reshape(shape),
+            'eventLoss': {cat: eventLoss[cat].reshape(shape) for cat in eventLoss},
+        }
+
     def findMaxOccupancy(self, usePadSpacing=True):
         if not self.hasFlux:
             raise RuntimeError("You must calculate the fluxes before retrieving the max occupancy")
 
-        occupancy = []
-        pads = []
-        for epoch in range(len(self.shifts)):
-            padIdx = None
-
-            for idx in range(len(self.padVec)):
-                if padIdx is None:
-                    padIdx = idx
-                else:
-                    if usePadSpacing:
-                        if self.padVec[idx].doses[epoch]["occupancy"] > self.padVec[padIdx].doses[epoch]["occupancy"]:
-                            padIdx = idx
-                    else:
-                        if self.padVec[idx].doses_extra[epoch]["occupancy"] > self.padVec[padIdx].doses_extra[epoch]["occupancy"]:
-                            padIdx = idx
-
-            if padIdx is None:
-                raise RuntimeError("Unable to find pad with max occupancy for epoch {}".format(epoch))
-
-            if usePadSpacing:
-                occupancy += [self.padVec[padIdx].doses[epoch]["occupancy"]]
-            else:
-                occupancy += [self.padVec[padIdx].doses_extra[epoch]["occupancy"]]
-            pads += [padIdx]
+        key = "occupancy" if usePadSpacing else "occupancy_extra"
+        if len(self.padVec) == 0:
+            raise RuntimeError("Unable to find pad with max occupancy, the sensor has no pads")
+
+        # argmax keeps the first pad in case of ties
+        pads = [int(padIdx) for padIdx in numpy.argmax(self.fluxArrays[key], axis=0)]
+        occupancy = [float(self.fluxArrays[key][padIdx, epoch]) for epoch, padIdx in enumerate(pads)]
 
         return (occupancy, pads)
 
+    def padQuantity(self, quantity: str):
+        """
+        Per pad quantity shown by plotSensorQuantity, as an array of shape (numPads, numEpochs): the average flux
+        ('flux'), the protons per pad ('protons'), the occupancy ('occupancy') or the event loss probability with no
+        deadtime ('loss_probability').
+        """
+        if not self.hasFlux:
+            raise RuntimeError("You must calculate the fluxes before retrieving the pad quantities")
+
+        from .functions import calcEventLossProb
+
+        if quantity == 'flux':
+            geometry = self.padGeometry()
+            area = (geometry["maxX"] - geometry["minX"]) * (geometry["maxY"] - geometry["minY"])
+            return self.fluxArrays['totalFlux']/(area / self._hist_stepping)[:, None]
+        if quantity == 'protons':
+            return self.fluxArrays['totalFlux'] * self.fluxArrays['occupancyNorm']
+        if quantity == 'occupancy':
+            return self.fluxArrays['occupancy']
+        if quantity == 'loss_probability':
+            return calcEventLossProb(0, self.fluxArrays['occupancy'])
+        raise RuntimeError("You must ask for a valid quantity")
+
     def plotSensorQuantity(self, quantity: str, margin: float = 0.8, minV = None, maxV = None, logz = False):
         if not self.hasFlux:
             raise RuntimeError("You must calculate the fluxes before retrieving the max occupancy")
@@ -252,10 +640,9 @@ class Sensor:
         if quantity not in quantity_options:
             raise RuntimeError("You must ask to plot a valid quantity")
 
-        from ROOT import TCanvas, TH2Poly, TLine, kRed, kBlack, kFALSE
-        from array import array
+        from ROOT import TCanvas, TLine, kRed, kBlack, kFALSE
         from math import ceil
-        from .functions import calcEventLossProb
+        from .exports import toTH2Poly
 
         numTPads = len(self.shifts)
         if numTPads <= 3:
@@ -273,7 +660,11 @@ class Sensor:
         canv = TCanvas(f"sensor_{quantity}", f"Sensor {quantity}", padX * 1300, padY * 1300)
         canv.Divide(padX, padY)
 
-        base_hist = TH2Poly("base_hist", "base_hist", self.minX-margin, self.maxX+margin, self.minY-margin, self.maxY+margin)
+        geometry = self.padGeometry()
+        values = self.padQuantity(quantity).tolist()
+
+        base_hist = toTH2Poly("base_hist", "base_hist", geometry["minX"], geometry["maxX"], geometry["minY"], geometry["maxY"],
+                              (self.minX-margin, self.maxX+margin, self.minY-margin, self.maxY+margin))
         base_hist.SetStats(kFALSE)
         base_hist.GetXaxis().SetTitle( "x [mm]" )
         base_hist.GetYaxis().SetTitle( "y [mm]" )
@@ -298,13 +689,8 @@ class Sensor:
         for key in sensorLines:
             sensorLines[key].SetLineColor(kRed)
 
-        padID = 0
-        for pad in self.padVec:
-            minX = pad.minX
-            maxX = pad.maxX
-            minY = pad.minY
-            maxY = pad.maxY
-
+        padEdges = zip(geometry["minX"].tolist(), geometry["maxX"].tolist(), geometry["minY"].tolist(), geometry["maxY"].tolist())
+        for padID, (minX, maxX, minY, maxY) in enumerate(padEdges):
             sensorLines[f"pad{padID}_Left"]   = TLine( minX, minY, minX, maxY)
             sensorLines[f"pad{padID}_Right"]  = TLine( maxX, minY, maxX, maxY)
             sensorLines[f"pad{padID}_Top"]    = TLine( minX, minY, maxX, minY)
@@ -315,20 +701,6 @@ class Sensor:
             sensorLines[f"pad{padID}_Top"].SetLineColor(kBlack)
             sensorLines[f"pad{padID}_Bottom"].SetLineColor(kBlack)
 
-            xVals = array( 'd' )
-            yVals = array( 'd' )
-            xVals.append(minX)
-            yVals.append(minY)
-            xVals.append(minX)
-            yVals.append(maxY)
-            xVals.append(maxX)
-            yVals.append(maxY)
-            xVals.append(maxX)
-            yVals.append(minY)
-            base_hist.AddBin(4, xVals, yVals)
-
-            padID += 1
-
         histograms = {}
         idx = 0
         for idx in range(numTPads):
@@ -350,20 +722,8 @@ class Sensor:
             this_hist = base_hist.Clone(f'{quantity}_pos_{idx-1}')
             this_hist.SetTitle(f"{quantity_options[quantity]['title']} - Position {idx-1}")
 
-            padID = 0
-            for pad in self.padVec:
-                try:
-                    loss_prob = calcEventLossProb(0, pad.doses[idx - 1]['occupancy'])
-                except ZeroDivisionError as e:
-                    loss_prob = 0
-                quantity_values = {
-                    'flux': pad.doses[idx - 1]['totalFlux']/(pad.area / self._hist_stepping),
-                    'protons': pad.doses[idx - 1]['totalFlux'] * pad.doses[idx - 1]['occupancyNorm'],
-                    'occupancy': pad.doses[idx - 1]['occupancy'],
-                    'loss_probability': loss_prob,
-                }
-                this_hist.SetBinContent(padID + 1, quantity_values[quantity])
-                padID += 1
+            for padID, padValues in enumerate(values):
+                this_hist.SetBinContent(padID + 1, padValues[idx - 1])
 
             this_hist.Draw("colz")
             histograms[f'pos_{idx-1}'] = this_hist
@@ -377,6 +737,35 @@ class Sensor:
 
         return (canv, persistance)
 
+    def occupancyMap(self, usePadSpacing=True):
+        """
+        Occupancy over the sensor, on the grid of the pad edges including the interpad distance, as shown by
+        plotOccupancy. Returns the x and y edges (in mm) and an array of shape (numEpochs, numBinsX, numBinsY), the
+        cells outside of the pads have no occupancy.
+        """
+        if not self.hasFlux:
+            raise RuntimeError("You must calculate the fluxes before retrieving the occupancy map")
+
+        geometry = self.padGeometry()
+        edgesX = numpy.unique(numpy.concatenate([geometry["minX_extra"], geometry["maxX_extra"]]))
+        edgesY = numpy.unique(numpy.concatenate([geometry["minY_extra"], geometry["maxY_extra"]]))
+        centersX = (edgesX[:-1] + edgesX[1:])/2
+        centersY = (edgesY[:-1] + edgesY[1:])/2
+
+        # Range of cells with the center strictly inside each pad
+        xLo = numpy.searchsorted(centersX, geometry["minX_extra"], side="right")
+        xHi = numpy.searchsorted(centersX, geometry["maxX_extra"], side="left")
+        yLo = numpy.searchsorted(centersY, geometry["minY_extra"], side="right")
+        yHi = numpy.searchsorted(centersY, geometry["maxY_extra"], side="left")
+
+        occupancy = self.fluxArrays["occupancy" if usePadSpacing else "occupancy_extra"]
+        occupancyMap = numpy.zeros((len(self.shifts), len(centersX), len(centersY)), dtype=numpy.float64)
+        # In reverse, so the first pad in padVec order takes the cells of overlapping pads
+        for padIdx in reversed(range(len(occupancy))):
+            occupancyMap[:, xLo[padIdx]:xHi[padIdx], yLo[padIdx]:yHi[padIdx]] = occupancy[padIdx][:, None, None]
+
+        return edgesX, edgesY, occupancyMap
+
     def plotOccupancy(self, usePadSpacing=True):
         if not self.hasFlux:
             raise RuntimeError("You must calculate the fluxes before retrieving the max occupancy")
@@ -395,42 +784,21 @@ class Sensor:
             padX = 3
             padY = ceil(numTPads/3.)
 
-        from ROOT import TCanvas, TH2D  # type: ignore
-        from array import array
+        from ROOT import TCanvas  # type: ignore
+        from .exports import toTH2D
 
-        edgesX = []
-        edgesY = []
-        for pad in self.padVec:
-            if pad.minX_extra not in edgesX:
-                edgesX += [pad.minX_extra]
-            if pad.maxX_extra not in edgesX:
-                edgesX += [pad.maxX_extra]
-            if pad.minY_extra not in edgesY:
-                edgesY += [pad.minY_extra]
-            if pad.maxY_extra not in edgesY:
-                edgesY += [pad.maxY_extra]
-        edgesX.sort()
-        edgesY.sort()
-
-        xArr, yArr = array( 'd' ), array( 'd' )
-        for edge in edgesX:
-            xArr.append(edge)
-        for edge in edgesY:
-            yArr.append(edge)
+        edgesX, edgesY, occupancyMap = self.occupancyMap(usePadSpacing=usePadSpacing)
 
         persistance = {}
         canv = TCanvas("epoch_Occupancy", "Epoch Occupancy", padX * 400, padY * 400)
         canv.Divide(padX, padY)
 
-        histTemplate = TH2D("template", "Sensor Occupancy", len(xArr)-1, xArr, len(yArr)-1, yArr)
+        histTemplate = toTH2D("template", "Sensor Occupancy", edgesX, edgesY)
         histTemplate.SetStats(False)
         histTemplate.GetXaxis().SetTitle("x [mm]")
         histTemplate.GetYaxis().SetTitle("y [mm]")
         histTemplate.GetZaxis().SetTitle("#mu")
 
-        numBinsX = len(xArr)-1
-        numBinsY = len(yArr)-1
-
         for epoch in range(len(self.shifts)):
             pad = canv.cd(epoch+1)
             #pad.SetLogz()
@@ -443,28 +811,9 @@ class Sensor:
             hist = histTemplate.Clone("occupancy-epoch{}".format(epoch))
             hist.SetTitle("Occupancy Position {}".format(self.shifts[epoch]))
 
-            for binX in range(numBinsX):
-                binXPos = (edgesX[binX] + edgesX[binX+1])/2
-                for binY in range(numBinsY):
-                    binYPos = (edgesY[binY] + edgesY[binY+1])/2
-
-                    occupancy = 0
-                    for pad in self.padVec:
-                        padMinX = pad.minX_extra
-                        padMaxX = pad.maxX_extra
-                        padMinY = pad.minY_extra
-                        padMaxY = pad.maxY_extra
-                        if ((binXPos > padMinX and binXPos < padMaxX) and
-                            (binYPos > padMinY and binYPos < padMaxY)):
-                            if usePadSpacing:
-                                occupancy = pad.doses[epoch]["occupancy"]
-                            else:
-                                occupancy = pad.doses_extra[epoch]["occupancy"]
-                            break
-
-                    binx = hist.GetXaxis().FindBin(binXPos)
-                    biny = hist.GetYaxis().FindBin(binYPos)
-                    hist.SetBinContent(binx, biny, occupancy)
+            for binX, column in enumerate(occupancyMap[epoch].tolist()):
+                for binY, occupancy in enumerate(column):
+                    hist.SetBinContent(binX + 1, binY + 1, occupancy)
 
             hist.Draw("colz")
 
@@ -472,9 +821,21 @@ class Sensor:
 
         return (canv, persistance)
 
+    def lossProbabilityVsDeadtime(self, timeSteps=1000, minTime=0, maxTime=10000, usePadSpacing=True): # Time in ns
+        """
+        Event loss probability of the pad with the highest occupancy, for timeSteps deadtimes from minTime up to
+        maxTime. Returns the deadtimes and an array of shape (numEpochs, timeSteps) with the probabilities.
+        """
+        occupancy, _ = self.findMaxOccupancy(usePadSpacing=usePadSpacing)
+
+        lossTimes = minTime + numpy.arange(timeSteps) * float(maxTime - minTime)/timeSteps
+        lossProbs = calcLossProb(lossTimes[None, :], numpy.asarray(occupancy)[:, None])
+
+        return lossTimes, lossProbs
+
     def plotLossProbabilityVsDeadtime(self, timeSteps=1000, minTime=0, maxTime=10000, usePadSpacing=True): # Time in ns
-        occupancy = self.findMaxOccupancy(usePadSpacing=usePadSpacing)
-        numTPads = len(occupancy)
+        lossTimes, lossProbs = self.lossProbabilityVsDeadtime(timeSteps=timeSteps, minTime=minTime, maxTime=maxTime, usePadSpacing=usePadSpacing)
+        numTPads = len(lossProbs)
 
         from math import ceil
 
@@ -488,8 +849,8 @@ class Sensor:
             padX = 3
             padY = ceil(numTPads/3.)
 
-        from ROOT import TCanvas, TH2D, TGraph  # type: ignore
-        from array import array
+        from ROOT import TCanvas, TH2D  # type: ignore
+        from .exports import toTGraph
 
         persistance = {}
         canv = TCanvas("epoch_loss_probability", "Epoch Loss Probability", padX * 400, padY * 400)
@@ -514,12 +875,7 @@ class Sensor:
             persistance[self.shifts[epoch]]["frame"].SetTitle("Position {}".format(self.shifts[epoch]))
             persistance[self.shifts[epoch]]["frame"].Draw()
 
-            timeArr, lossProb = array( 'd' ), array( 'd' )
-            for i in range(timeSteps):
-                time = minTime + i * float(maxTime - minTime)/timeSteps
-                timeArr.append(time)
-                lossProb.append(calcLossProb(time, occupancy[epoch]))
-            persistance[self.shifts[epoch]]["graph"] = TGraph(timeSteps, timeArr, lossProb)
+            persistance[self.shifts[epoch]]["graph"] = toTGraph(lossTimes, lossProbs[epoch])
             persistance[self.shifts[epoch]]["graph"].Draw("l same")
 
         return (canv, persistance)
@@ -530,6 +886,7 @@ class Sensor:
 
         import matplotlib.pyplot as plt
         import matplotlib.patches as patches
+        import mplhep
 
         plt.style.use(mplhep.style.CMS)
 
@@ -576,6 +933,24 @@ class Sensor:
 
         return fig
 
+    def getVoltageEOL(self, chargeFunc, integratedLuminosity=300, usePadSpacing=True, minCharge=10, maxCharge=100, maxVolt=700, mode="scan"):
+        """
+        Operating voltage window of each pad, as a list of (minV, maxV) in the padVec order, see SensorPad.getVoltageEOL.
+        The cells of all pads are evaluated together, so "broadcast" and "bisection" call chargeFunc a handful of times.
+        """
+        phi = []
+        for pad in self.padVec:
+            _, _, dose = pad.doseMapEOL(integratedLuminosity=integratedLuminosity, usePadSpacing=usePadSpacing)
+            phi += [dose.ravel()/2] # Convert from p/cm^2 to neq/cm^2
+
+        if len(phi) == 0:
+            return []
+
+        minVCell, maxVCell = calculateVoltageWindows(chargeFunc, numpy.concatenate(phi), minCharge=minCharge, maxCharge=maxCharge, maxVolt=maxVolt, mode=mode)
+        splits = numpy.cumsum([len(padPhi) for padPhi in phi])[:-1]
+
+        return [combineVoltageWindows(padMinV, padMaxV) for padMinV, padMaxV in zip(numpy.split(minVCell, splits), numpy.split(maxVCell, splits))]
+
     def maxDoseEOL(self, integratedLuminosity=300, usePadSpacing = True):
         maxDose = None
 
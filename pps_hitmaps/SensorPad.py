@@ -24,6 +24,8 @@ from __future__ import annotations
 
 from .ClassFields import *
 
+import numpy
+
 def cleanEdges(edgeList, threshold=0.000001):
     newEdges = []
 
@@ -46,6 +48,187 @@ def summariseEdges(edgeListVector, threshold=0.000001):
 
     return cleanEdges(allEdges, threshold=threshold)
 
+def calculatePadFluxes(hitmap, minX, maxX, minY, maxY, shifts):
+    """
+    Batched flux calculation for a set of pad rectangles (arrays of shape (numPads,), in mm) over all the shift
+    positions (shape (numEpochs, 2), in mm). Returns a dictionary of arrays of shape (numPads, numEpochs):
+      - totalFlux: fluence integrated over the pad, weighting each hitmap bin by its covered fraction
+      - maxFlux: maximum fluence of the hitmap bins overlapping the pad, NaN if there are none
+      - occupancy: mean number of particles per bunch crossing
+      - centerX, centerY: pad center, in mm
+      - xLo, xHi, yLo, yHi: index ranges of the hitmap bins overlapping the pad
+    Remember PPSHitmap is in m, sensor is in mm
+    """
+    shifts = numpy.asarray(shifts, dtype=numpy.float64).reshape(-1, 2)
+
+    minX = numpy.asarray(minX, dtype=numpy.float64)[:, None] + shifts[None, :, 0]
+    maxX = numpy.asarray(maxX, dtype=numpy.float64)[:, None] + shifts[None, :, 0]
+    minY = numpy.asarray(minY, dtype=numpy.float64)[:, None] + shifts[None, :, 1]
+    maxY = numpy.asarray(maxY, dtype=numpy.float64)[:, None] + shifts[None, :, 1]
+
+    totalFlux = hitmap.integrateFluence(minX/1000, maxX/1000, minY/1000, maxY/1000)
+    xLo, xHi, yLo, yHi = hitmap.binRanges(minX/1000, maxX/1000, minY/1000, maxY/1000)
+    maxFlux = hitmap.maxFluenceInRanges(xLo, xHi, yLo, yHi)
+
+    occupancyNorm = (hitmap.xStep *
+                     hitmap.yStep * 1.0E4) # in cm^2
+
+    return {
+        'totalFlux': totalFlux,
+        'maxFlux': maxFlux,
+        'occupancyNorm': occupancyNorm,
+        'occupancy': totalFlux * 1.6E-12 * occupancyNorm,
+        'centerX': (minX + maxX)/2,
+        'centerY': (minY + maxY)/2,
+        'xLo': xLo,
+        'xHi': xHi,
+        'yLo': yLo,
+        'yHi': yHi,
+    }
+
+def calculateVoltageWindows(chargeFunc, phi, minCharge=10, maxCharge=100, maxVolt=700, mode="scan"):
+    """
+    Operating voltage window of each cell with fluence phi (in neq/cm^2), scanning the integer voltages up to maxVolt.
+    minV is the first voltage with a charge of at least minCharge and maxV the last one before the charge goes above
+    maxCharge, NaN when not found. The modes are:
+      - "scan": calls chargeFunc(Volt, phi) with scalars, voltage by voltage for each cell
+      - "broadcast": a single call of chargeFunc on a (voltages, cells) grid of arrays
+      - "bisection": bisection on arrays across all cells, it assumes the charge increases with the voltage
+    Returns two float arrays with the shape of phi.
+    """
+    phi = numpy.asarray(phi, dtype=numpy.float64)
+    shape = phi.shape
+    phi = phi.ravel()
+    minV = numpy.full(len(phi), numpy.nan)
+    maxV = numpy.full(len(phi), numpy.nan)
+
+    if mode == "scan":
+        for cell, cellPhi in enumerate(phi.tolist()):
+            for Volt in range(1, maxVolt+1):
+                charge = chargeFunc(Volt, cellPhi)
+                if numpy.isnan(minV[cell]) and charge >= minCharge:
+                    minV[cell] = Volt
+                if charge > maxCharge:
+                    maxV[cell] = Volt - 1
+                    break
+    elif mode == "broadcast":
+        volts = numpy.arange(1, maxVolt+1)
+        cellsPerChunk = max(1, (1 << 22)//maxVolt) # Keeps the (voltages, cells) arrays to a few million entries
+        for first in range(0, len(phi), cellsPerChunk):
+            cells = slice(first, first + cellsPerChunk)
+            charge = numpy.broadcast_to(chargeFunc(volts[:, None], phi[None, cells]), (maxVolt, len(phi[cells])))
+
+            above = charge > maxCharge
+            hasAbove = above.any(axis=0)
+            firstAbove = numpy.where(hasAbove, above.argmax(axis=0), maxVolt - 1)
+            # The scan stops at the first voltage above maxCharge
+            working = (charge >= minCharge) & (volts[:, None] <= volts[firstAbove][None, :])
+            hasWorking = working.any(axis=0)
+
+            minV[cells][hasWorking] = volts[working.argmax(axis=0)][hasWorking]
+            maxV[cells][hasAbove] = volts[firstAbove][hasAbove] - 1
+    elif mode == "bisection":
+        def firstVoltage(condition):
+            # Smallest voltage in [1, maxVolt] where condition holds, maxVolt+1 if none
+            lo = numpy.ones(len(phi), dtype=numpy.int64)
+            hi = numpy.full(len(phi), maxVolt + 1, dtype=numpy.int64)
+            active = lo < hi
+            while active.any():
+                mid = (lo + hi)//2
+                holds = condition(numpy.asarray(chargeFunc(numpy.minimum(mid, maxVolt), phi))) | (mid > maxVolt)
+                hi = numpy.where(active & holds, mid, hi)
+                lo = numpy.where(active & ~holds, mid + 1, lo)
+                active = lo < hi
+            return lo
+
+        firstWorking = firstVoltage(lambda charge: charge >= minCharge)
+        firstAbove = firstVoltage(lambda charge: charge > maxCharge)
+
+        hasWorking = (firstWorking <= maxVolt) & (firstWorking <= firstAbove)
+        hasAbove = firstAbove <= maxVolt
+        minV[hasWorking] = firstWorking[hasWorking]
+        maxV[hasAbove] = firstAbove[hasAbove] - 1
+    else:
+        raise ValueError("Unknown voltage search mode: {}".format(mode))
+
+    return minV.reshape(shape), maxV.reshape(shape)
+
+def combineVoltageWindows(minVCell, maxVCell):
+    """
+    Common operating window of a set of cells, from the per cell windows of calculateVoltageWindows.
+    Returns (None, None) if some cell never reaches the minimum charge.
+    """
+    minVCell = numpy.asarray(minVCell, dtype=numpy.float64)
+    maxVCell = numpy.asarray(maxVCell, dtype=numpy.float64)
+
+    if numpy.isnan(minVCell).any():
+        return (None, None)
+
+    minV = int(minVCell.max()) if minVCell.size > 0 else None
+    maxV = None
+    if not numpy.isnan(maxVCell).all():
+        maxV = int(numpy.nanmin(maxVCell))
+
+    return (minV, maxV)
+
+class FluxMap:
+    """
+    Lazy view of the hitmap bins overlapping a pad in one epoch. Only the index ranges into the hitmap grid and the pad
+    center are kept, the coordinates (in mm, local to the pad center) and the flux values are materialised as arrays
+    on request. Iterating over it yields the per bin dictionaries used in previous versions.
+    """
+    def __init__(self, hitmap, xLo: int, xHi: int, yLo: int, yHi: int, centerX: float, centerY: float):
+        self._fluence = hitmap.fluence[xLo:xHi, yLo:yHi] # A view of the grid, not a copy
+        self.xLo = int(xLo)
+        self.xHi = int(xHi)
+        self.yLo = int(yLo)
+        self.yHi = int(yHi)
+        self.centerX = float(centerX) # in mm
+        self.centerY = float(centerY) # in mm
+        self._xMin = hitmap.xMin
+        self._xStep = hitmap.xStep
+        self._yMin = hitmap.yMin
+        self._yStep = hitmap.yStep
+
+    def _binCenters(self):
+        # Same rounding as the hitmap coordinates, in mm
+        xVals = numpy.round(self._xMin + numpy.arange(self.xLo, self.xHi)*self._xStep, 6)*1000
+        yVals = numpy.round(self._yMin + numpy.arange(self.yLo, self.yHi)*self._yStep, 6)*1000
+        return xVals, yVals
+
+    def grid(self):
+        """Bin edges along x and y in local coordinates and the 2D flux block, NaN for points missing from the hitmap"""
+        xVals, yVals = self._binCenters()
+        xEdges = numpy.append(xVals - self._xStep*1000/2, xVals[-1:] + self._xStep*1000/2) - self.centerX
+        yEdges = numpy.append(yVals - self._yStep*1000/2, yVals[-1:] + self._yStep*1000/2) - self.centerY
+        return xEdges, yEdges, numpy.asarray(self._fluence)
+
+    def arrays(self):
+        """Dictionary of 1D arrays with the same keys as the per bin dictionaries, skipping missing points"""
+        xVals, yVals = self._binCenters()
+        xIdx, yIdx = numpy.nonzero(~numpy.isnan(self._fluence))
+        x = xVals[xIdx]
+        y = yVals[yIdx]
+        return {
+            'flux': numpy.asarray(self._fluence[xIdx, yIdx], dtype=numpy.float64),
+            'x': x,
+            'y': y,
+            'xLocal': x - self.centerX,
+            'yLocal': y - self.centerY,
+            'leftLocal': x - self._xStep*1000/2 - self.centerX,
+            'rightLocal': x + self._xStep*1000/2 - self.centerX,
+            'topLocal': y + self._yStep*1000/2 - self.centerY,
+            'bottomLocal': y - self._yStep*1000/2 - self.centerY,
+        }
+
+    def __len__(self):
+        return int(numpy.count_nonzero(~numpy.isnan(self._fluence)))
+
+    def __iter__(self):
+        arrays = self.arrays()
+        for idx in range(len(arrays['flux'])):
+            yield {key: float(arrays[key][idx]) for key in arrays}
+
 # Pad dimensions in mm
 # Assume a default pad size of 1.3 mm
 defaultPadSize = 1.3
@@ -105,149 +288,30 @@ class SensorPad:
         if len(shifts) != self.epochs:
             raise ValueError(f'Expected the number of shift positions to match the number of epochs')
 
+        fluxes = calculatePadFluxes(hitmap, [self.minX], [self.maxX], [self.minY], [self.maxY], shifts)
+        fluxes_extra = calculatePadFluxes(hitmap, [self.minX_extra], [self.maxX_extra], [self.minY_extra], [self.maxY_extra], shifts)
+
+        self._setDoses(hitmap, fluxes, fluxes_extra, 0)
+
+    def _setDoses(self, hitmap, fluxes: dict, fluxes_extra: dict, padIdx: int):
+        """Fill doses and doses_extra from the batched results of calculatePadFluxes for the pad with index padIdx"""
         self.doses = []
         self.doses_extra = []
 
-        for epoch in range(self.epochs):
-            minX = self.minX + shifts[epoch][0]
-            maxX = self.maxX + shifts[epoch][0]
-            minY = self.minY + shifts[epoch][1]
-            maxY = self.maxY + shifts[epoch][1]
-
-            centerPadX = (minX + maxX)/2
-            centerPadY = (minY + maxY)/2
-
-            minX_extra = self.minX_extra + shifts[epoch][0]
-            maxX_extra = self.maxX_extra + shifts[epoch][0]
-            minY_extra = self.minY_extra + shifts[epoch][1]
-            maxY_extra = self.maxY_extra + shifts[epoch][1]
-
-            centerPadX_extra = (minX_extra + maxX_extra)/2
-            centerPadY_extra = (minY_extra + maxY_extra)/2
-
-            flux = 0
-            flux_extra = 0
-            maxFlux = None
-            maxFlux_extra = None
-            fluxMap = []
-            fluxMap_extra = []
-
-            for x in hitmap.map:
-                xVal = x*1000
-                left = xVal - hitmap.xStep*1000/2
-                right = xVal + hitmap.xStep*1000/2
-
-                inSensitiveArea = True
-                inSensitiveArea_extra = True
-
-                if ((left < minX and right < minX) or
-                    (left > maxX and right > maxX)):
-                    inSensitiveArea = False
-
-                if ((left < minX_extra and right < minX_extra) or
-                    (left > maxX_extra and right > maxX_extra)):
-                    inSensitiveArea_extra = False
-
-                contributionX = 0
-                if inSensitiveArea:
-                    contributionX = 1
-                    if right > maxX:
-                        contributionX -= (right - maxX)/(hitmap.xStep*1000)
-                    if left < minX:
-                        contributionX -= (minX - left)/(hitmap.xStep*1000)
-
-                contributionX_extra = 0
-                if inSensitiveArea_extra:
-                    contributionX_extra = 1
-                    if right > maxX_extra:
-                        contributionX_extra -= (right - maxX_extra)/(hitmap.xStep*1000)
-                    if left < minX_extra:
-                        contributionX_extra -= (minX_extra - left)/(hitmap.xStep*1000)
-
-                if not (inSensitiveArea or inSensitiveArea_extra):
-                    continue
-
-                for y in hitmap.map[x]:
-                    yVal = y*1000
-                    bottom = yVal - hitmap.yStep*1000/2
-                    top = yVal + hitmap.yStep*1000/2
-
-                    inSensitiveAreaY = True
-                    inSensitiveAreaY_extra = True
-
-                    if ((bottom < minY and top < minY) or
-                        (bottom > maxY and top > maxY)):
-                        inSensitiveAreaY = False
-
-                    if ((bottom < minY_extra and top < minY_extra) or
-                        (bottom > maxY_extra and top > maxY_extra)):
-                        inSensitiveAreaY_extra = False
-
-                    if inSensitiveArea and inSensitiveAreaY:
-                        contributionY = 1
-                        if top > maxY:
-                            contributionY -= (top - maxY)/(hitmap.yStep*1000)
-                        if bottom < minY:
-                            contributionY -= (minY - bottom)/(hitmap.yStep*1000)
-
-                        flux += hitmap.map[x][y] * contributionX * contributionY
-
-                        if maxFlux is None or hitmap.map[x][y] > maxFlux:
-                            maxFlux = hitmap.map[x][y]
-
-                        fluxMap += [{
-                            'flux': hitmap.map[x][y],
-                            'x': xVal,
-                            'y': yVal,
-                            'xLocal': xVal - centerPadX,
-                            'yLocal': yVal - centerPadY,
-                            'leftLocal': left - centerPadX,
-                            'rightLocal': right - centerPadX,
-                            'topLocal': top - centerPadY,
-                            'bottomLocal': bottom - centerPadY,
-                        }]
-
-                    if inSensitiveArea_extra and inSensitiveAreaY_extra:
-                        contributionY_extra = 1
-                        if top > maxY_extra:
-                            contributionY_extra -= (top - maxY_extra)/(hitmap.yStep*1000)
-                        if bottom < minY_extra:
-                            contributionY_extra -= (minY_extra - bottom)/(hitmap.yStep*1000)
-
-                        flux_extra += hitmap.map[x][y] * contributionX_extra * contributionY_extra
-
-                        if maxFlux_extra is None or hitmap.map[x][y] > maxFlux_extra:
-                            maxFlux_extra = hitmap.map[x][y]
-
-                        fluxMap_extra += [{
-                            'flux': hitmap.map[x][y],
-                            'x': xVal,
-                            'y': yVal,
-                            'xLocal': xVal - centerPadX_extra,
-                            'yLocal': yVal - centerPadY_extra,
-                            'leftLocal': left - centerPadX_extra,
-                            'rightLocal': right - centerPadX_extra,
-                            'topLocal': top - centerPadY_extra,
-                            'bottomLocal': bottom - centerPadY_extra,
-                        }]
-
-            occupancyNorm = (hitmap.xStep *
-                             hitmap.yStep * 1.0E4) # in cm^2
-
-            self.doses += [{
-                'totalFlux': flux,
-                'maxFlux': maxFlux,
-                'occupancyNorm': occupancyNorm,
-                'occupancy': flux * 1.6E-12 * occupancyNorm,
-                'fluxMap': fluxMap,
-                }]
-            self.doses_extra += [{
-                'totalFlux': flux_extra,
-                'maxFlux': maxFlux_extra,
-                'occupancyNorm': occupancyNorm,
-                'occupancy': flux_extra * 1.6E-12 * occupancyNorm,
-                'fluxMap': fluxMap_extra,
-                }]
+        for doses, padFluxes in [(self.doses, fluxes), (self.doses_extra, fluxes_extra)]:
+            for epoch in range(padFluxes['totalFlux'].shape[1]):
+                maxFlux = float(padFluxes['maxFlux'][padIdx, epoch])
+
+                doses += [{
+                    'totalFlux': float(padFluxes['totalFlux'][padIdx, epoch]),
+                    'maxFlux': maxFlux if not numpy.isnan(maxFlux) else None,
+                    'occupancyNorm': padFluxes['occupancyNorm'],
+                    'occupancy': float(padFluxes['occupancy'][padIdx, epoch]),
+                    'fluxMap': FluxMap(hitmap,
+                                       padFluxes['xLo'][padIdx, epoch], padFluxes['xHi'][padIdx, epoch],
+                                       padFluxes['yLo'][padIdx, epoch], padFluxes['yHi'][padIdx, epoch],
+                                       padFluxes['centerX'][padIdx, epoch], padFluxes['centerY'][padIdx, epoch]),
+                    }]
 
     def plotFlux(self, usePadSpacing = True, printEpoch = None):
         from math import ceil
@@ -343,19 +407,9 @@ class SensorPad:
                 print("Printing the epoch {}".format(idx))
                 print("There are {} flux points".format(len(epoch['fluxMap'])))
 
-            xEdges = []
-            yEdges = []
-            for point in epoch['fluxMap']:
-                if point['leftLocal'] not in xEdges:
-                    xEdges += [point['leftLocal']]
-                if point['rightLocal'] not in xEdges:
-                    xEdges += [point['rightLocal']]
-                if point['topLocal'] not in yEdges:
-                    yEdges += [point['topLocal']]
-                if point['bottomLocal'] not in yEdges:
-                    yEdges += [point['bottomLocal']]
-            xEdges.sort()
-            yEdges.sort()
+            xEdges, yEdges, _ = epoch['fluxMap'].grid()
+            xEdges = xEdges.tolist()
+            yEdges = yEdges.tolist()
 
             xEdges = cleanEdges(xEdges)
             yEdges = cleanEdges(yEdges)
@@ -376,15 +430,16 @@ class SensorPad:
                 yArr.append(edge)
 
             hist = TH2D("pad_flux_{}".format(idx), "Pad Flux - Position {}".format(idx), len(xArr)-1, xArr, len(yArr)-1, yArr)
-            for point in epoch['fluxMap']:
-                binx = hist.GetXaxis().FindBin(point['xLocal'])
-                biny = hist.GetYaxis().FindBin(point['yLocal'])
-                hist.SetBinContent(binx, biny, point['flux'])
+            points = epoch['fluxMap'].arrays()
+            for xLocal, yLocal, flux in zip(points['xLocal'].tolist(), points['yLocal'].tolist(), points['flux'].tolist()):
+                binx = hist.GetXaxis().FindBin(xLocal)
+                biny = hist.GetYaxis().FindBin(yLocal)
+                hist.SetBinContent(binx, biny, flux)
                 if printEpoch is not None and idx == printEpoch:
                     print("Flux point:")
-                    print("  - local coords: ({},{})".format(point['xLocal'], point['yLocal']))
+                    print("  - local coords: ({},{})".format(xLocal, yLocal))
                     print("  - bin idx: ({}, {})".format(binx, biny))
-                    print("  - flux: {}".format(point['flux']))
+                    print("  - flux: {}".format(flux))
                 #bin = hist.FindBin(point['xLocal'], point['yLocal'])
                 #hist.SetBinContent(bin, point['flux'])
 
@@ -411,10 +466,11 @@ class SensorPad:
 
         return (canv, persistance)
 
-    def plotDose(self, maxTime=365, integratedLuminosity=300, usePadSpacing = True):
+    def doseOverTime(self, maxTime=365, integratedLuminosity=300, usePadSpacing = True):
         """
-        maxTime in days
-        integratedLuminosity in fb-1
+        Average dose of the pad over time, with integratedLuminosity (in fb-1) delivered over maxTime (in days) and
+        split evenly over the epochs. Returns the times of the epoch boundaries (in days) and the dose accumulated at
+        each of them (in p/cm^2), both arrays of shape (epochs + 1,).
         """
         doses = self.doses
         padArea = (self.maxX - self.minX) * (self.maxY - self.minY)
@@ -422,17 +478,34 @@ class SensorPad:
             doses = self.doses_extra
             padArea = (self.maxX_extra - self.minX_extra) * (self.maxY_extra - self.minY_extra)
 
+        epochLumi = float(integratedLuminosity)/self.epochs
+        epochTime = float(maxTime)/self.epochs
+
+        totalFlux = numpy.array([doses[epoch]["totalFlux"] for epoch in range(self.epochs)], dtype=numpy.float64)
+        occupancyNorm = numpy.array([doses[epoch]["occupancyNorm"] for epoch in range(self.epochs)], dtype=numpy.float64)
+
+        times = numpy.concatenate([[0.0], numpy.cumsum(numpy.full(self.epochs, epochTime))])
+        dose = numpy.concatenate([[0.0], numpy.cumsum((totalFlux * occupancyNorm * epochLumi)/(padArea/100))]) # convert mm^2 to cm^2
+
+        return times, dose
+
+    def plotDose(self, maxTime=365, integratedLuminosity=300, usePadSpacing = True):
+        """
+        maxTime in days
+        integratedLuminosity in fb-1
+        """
         # self.epochs for the number of epochs
 
         from ROOT import TCanvas, TH1D  # type: ignore
         from ROOT import TLine  # type: ignore
         from ROOT import kRed, kBlue  # type: ignore
 
-        epochLumi = float(integratedLuminosity)/self.epochs
+        times, dose = self.doseOverTime(maxTime=maxTime, integratedLuminosity=integratedLuminosity, usePadSpacing=usePadSpacing)
+        times = times.tolist()
+        dose = dose.tolist()
+
         epochTime = float(maxTime)/self.epochs
-        maxDose = 0
-        for epoch in range(self.epochs):
-            maxDose += (doses[epoch]["totalFlux"] * doses[epoch]["occupancyNorm"] * epochLumi)/(padArea/100) # convert mm^2 to cm^2
+        maxDose = dose[-1]
 
         persistance = {}
         canv = TCanvas("dose_vs_time", "Dose over time", 600 * self.epochs, 800)
@@ -450,22 +523,12 @@ class SensorPad:
             persistance[lineName].SetLineStyle(2)
             persistance[lineName].Draw("same")
 
-        startDose = 0
-        endDose = 0
-        startT = 0
-        endT = 0
         for epoch in range(self.epochs):
-            endDose = startDose + (doses[epoch]["totalFlux"] * doses[epoch]["occupancyNorm"] * epochLumi)/(padArea/100)
-            endT = startT + epochTime
-
             epochName = "dose-{}".format(epoch)
-            persistance[epochName] = TLine(startT, startDose, endT, endDose)
+            persistance[epochName] = TLine(times[epoch], dose[epoch], times[epoch + 1], dose[epoch + 1])
             persistance[epochName].SetLineColor(kBlue)
             persistance[epochName].Draw("same")
 
-            startDose = endDose
-            startT = endT
-
         return (canv, persistance)
 
     def plotDoseOverDays(self, maxTime=365, integratedLuminosity=300, usePadSpacing=True):
@@ -482,6 +545,55 @@ class SensorPad:
             maxDose += (doses[epoch]["totalFlux"] * doses[epoch]["occupancyNorm"] * epochLumi)/(padArea/100) # convert mm^2 to cm^2
 
 
+    def doseMapEOL(self, integratedLuminosity=300, usePadSpacing = True):
+        """
+        End of life dose over the pad, accumulated over the epochs with integratedLuminosity (in fb-1) split evenly.
+        The hitmap bins of all epochs, in coordinates local to the pad center, are merged into a common grid.
+        Returns the x and y edges of the grid (in mm) and the dose array of shape (numBinsX, numBinsY), in p/cm^2.
+        If there is no flux information, the grid is a single cell covering the pad with no dose.
+        """
+        doses = self.doses
+        if not usePadSpacing:
+            doses = self.doses_extra
+
+        epochLumi = float(integratedLuminosity)/self.epochs
+
+        edgesX = []
+        edgesY = []
+        for epoch in doses:
+            points = epoch['fluxMap'].arrays()
+            edgesX += [cleanEdges(numpy.unique(numpy.concatenate([points['leftLocal'], points['rightLocal']])).tolist())]
+            edgesY += [cleanEdges(numpy.unique(numpy.concatenate([points['bottomLocal'], points['topLocal']])).tolist())]
+
+        edgesX = numpy.array(summariseEdges(edgesX), dtype=numpy.float64)
+        edgesY = numpy.array(summariseEdges(edgesY), dtype=numpy.float64)
+
+        if len(edgesX) <= 1 or len(edgesY) <= 1:
+            minX, maxX, minY, maxY = (self.minX, self.maxX, self.minY, self.maxY) if usePadSpacing else (self.minX_extra, self.maxX_extra, self.minY_extra, self.maxY_extra)
+            halfX = (maxX - minX)/2
+            halfY = (maxY - minY)/2
+            return numpy.array([-halfX, halfX]), numpy.array([-halfY, halfY]), numpy.zeros((1, 1))
+
+        centersX = (edgesX[:-1] + edgesX[1:])/2
+        centersY = (edgesY[:-1] + edgesY[1:])/2
+
+        dose = numpy.zeros((len(centersX), len(centersY)), dtype=numpy.float64)
+        for epoch in doses:
+            epochEdgesX, epochEdgesY, flux = epoch['fluxMap'].grid()
+            if flux.size == 0:
+                continue
+
+            # Hitmap bin of the epoch containing each cell center, the cells outside of the epoch bins get no dose
+            binX = numpy.searchsorted(epochEdgesX, centersX) - 1
+            binY = numpy.searchsorted(epochEdgesY, centersY) - 1
+            insideX = (binX >= 0) & (binX < flux.shape[0])
+            insideY = (binY >= 0) & (binY < flux.shape[1])
+
+            epochFlux = numpy.nan_to_num(flux[numpy.ix_(binX[insideX], binY[insideY])], nan=0.0)
+            dose[numpy.ix_(insideX, insideY)] += epochFlux * epochLumi
+
+        return edgesX, edgesY, dose
+
     def plotDoseEOL(self, integratedLuminosity=300, usePadSpacing = True):
         """
         maxTime in days
@@ -491,13 +603,10 @@ class SensorPad:
         if not usePadSpacing:
             doses = self.doses_extra
 
-        from ROOT import TCanvas, TH2D  # type: ignore
+        from ROOT import TCanvas  # type: ignore
         from ROOT import TLine  # type: ignore
         from ROOT import kRed, kBlue  # type: ignore
-        from array import array
-
-        epochLumi = float(integratedLuminosity)/self.epochs
-        #epochTime = float(maxTime)/self.epochs
+        from .exports import toTH2D
 
         persistance = {}
         canv = TCanvas("dose_eol", "Dose EOL", 800, 800)
@@ -561,72 +670,8 @@ class SensorPad:
             persistance["pad_topEdge"].SetLineColor(kBlue)
             persistance["pad_bottomEdge"].SetLineColor(kBlue)
 
-        edgesX = []
-        edgesY = []
-        for epoch in doses:
-            xEdges = []
-            yEdges = []
-            for point in epoch['fluxMap']:
-                if point['leftLocal'] not in xEdges:
-                    xEdges += [point['leftLocal']]
-                if point['rightLocal'] not in xEdges:
-                    xEdges += [point['rightLocal']]
-                if point['topLocal'] not in yEdges:
-                    yEdges += [point['topLocal']]
-                if point['bottomLocal'] not in yEdges:
-                    yEdges += [point['bottomLocal']]
-            xEdges.sort()
-            yEdges.sort()
-
-            xEdges = cleanEdges(xEdges)
-            yEdges = cleanEdges(yEdges)
-
-            edgesX += [xEdges]
-            edgesY += [yEdges]
-
-        edgesX = summariseEdges(edgesX)
-        edgesY = summariseEdges(edgesY)
-
-        isEmpty = False
-        if len(edgesX) <= 1 or len(edgesY) <= 1:
-            isEmpty = True
-            edgesX = [minX, maxX]
-            edgesY = [minY, maxY]
-
-        xArr, yArr = array( 'd' ), array( 'd' )
-        for edge in edgesX:
-            xArr.append(edge)
-        for edge in edgesY:
-            yArr.append(edge)
-
-        numBinsX = len(xArr)-1
-        numBinsY = len(yArr)-1
-        try:
-            hist = TH2D("pad_dose_eol", "Pad Dose - End of Life ({}{})".format(integratedLuminosity, " fb^{-1}"), numBinsX, xArr, numBinsY, yArr)
-        except TypeError as e:
-            print("Pad position: ({}, {})".format((self.maxX + self.minX)/2, (self.maxY + self.minY)/2))
-            print("There are {} epochs in doses".format(len(doses)))
-            for epoch in doses:
-                print(epoch)
-            print(" bins x: {}".format(numBinsX))
-            print(" bins y: {}".format(numBinsY))
-            raise e
-
-        if not isEmpty:
-            for binX in range(numBinsX):
-                binXPos = (edgesX[binX] + edgesX[binX+1])/2
-                for binY in range(numBinsY):
-                    binYPos = (edgesY[binY] + edgesY[binY+1])/2
-                    dose = 0
-                    for epoch in doses:
-                        for point in epoch['fluxMap']:
-                            if (binXPos > point['leftLocal']   and binXPos < point['rightLocal'] and
-                                binYPos > point['bottomLocal'] and binYPos < point['topLocal']):
-                                dose += point['flux'] * epochLumi
-                                break
-                    binx = hist.GetXaxis().FindBin(binXPos)
-                    biny = hist.GetYaxis().FindBin(binYPos)
-                    hist.SetBinContent(binx, biny, dose)
+        edgesX, edgesY, dose = self.doseMapEOL(integratedLuminosity=integratedLuminosity, usePadSpacing=usePadSpacing)
+        hist = toTH2D("pad_dose_eol", "Pad Dose - End of Life ({}{})".format(integratedLuminosity, " fb^{-1}"), edgesX, edgesY, dose)
 
         hist.SetStats(False)
         hist.GetXaxis().SetTitle( "x [mm]" )
@@ -651,65 +696,25 @@ class SensorPad:
 
     def maxDoseEOL(self, integratedLuminosity=300, usePadSpacing = True, reuse=None):
         if reuse is not None:
-            canv = reuse[0]
-            persistance = reuse[1]
-        else:
-            canv, persistance = self.plotDoseEOL(integratedLuminosity=integratedLuminosity, usePadSpacing=usePadSpacing)
+            hist = reuse[1]['hist']
+            return hist.GetBinContent(hist.GetMaximumBin())
 
-        hist = persistance['hist']
+        _, _, dose = self.doseMapEOL(integratedLuminosity=integratedLuminosity, usePadSpacing=usePadSpacing)
 
-        return hist.GetBinContent(hist.GetMaximumBin())
+        return float(dose.max())
 
-    def getVoltageEOL(self, chargeFunc, integratedLuminosity=300, usePadSpacing=True, minCharge=10, maxCharge=100, maxVolt=700):
+    def getVoltageEOL(self, chargeFunc, integratedLuminosity=300, usePadSpacing=True, minCharge=10, maxCharge=100, maxVolt=700, mode="scan"):
         """
         integratedLuminosity in fb-1
         minCharge in fC - Remember that lower charge typically carries a worse time resolution
         maxCharge in fC - Remember that lower charge typically carries a worse time resolution
+        mode - how chargeFunc is evaluated, see calculateVoltageWindows
+        Returns the (minV, maxV) window where all the cells of the pad work, (None, None) if some cell never does
         """
-        canv, persistance = self.plotDoseEOL(integratedLuminosity=integratedLuminosity, usePadSpacing=usePadSpacing)
-
-        hist = persistance['hist']
-
-        binsX = hist.GetNbinsX()
-        binsY = hist.GetNbinsY()
-
-        minV = None
-        maxV = None
-
-        allCellsWork = True
-        for x in range(1, binsX+1):
-            for y in range(1, binsY+1):
-                # TODO: add check that bin is in coverage of pad
-                phi = hist.GetBinContent(x, y)/2 # Convert from p/cm^2 to neq/cm^2
-
-                minVCell = None
-                maxVCell = None
-
-                for Volt in range(1, maxVolt+1):
-                    charge = chargeFunc(Volt, phi)
-                    if minVCell is None and charge >= minCharge:
-                        minVCell = Volt
-                    if maxVCell is None and charge > maxCharge:
-                        maxVCell = Volt - 1
-                        break
-
-                if minVCell is None:
-                    allCellsWork = False
-
-                if minV is None:
-                    minV = minVCell
-                if maxV is None:
-                    maxV = maxVCell
-
-                if minVCell is not None and minV is not None:
-                    if minVCell > minV:
-                        minV = minVCell
-                if maxVCell is not None and maxV is not None:
-                    if maxVCell < maxV:
-                        maxV = maxVCell
+        _, _, dose = self.doseMapEOL(integratedLuminosity=integratedLuminosity, usePadSpacing=usePadSpacing)
 
-        if not allCellsWork:
-            minV = None
-            maxV = None
+        phi = dose.ravel()/2 # Convert from p/cm^2 to neq/cm^2
+        # TODO: add check that bin is in coverage of pad
+        minVCell, maxVCell = calculateVoltageWindows(chargeFunc, phi, minCharge=minCharge, maxCharge=maxCharge, maxVolt=maxVolt, mode=mode)
 
-        return (minV, maxV)
\ No newline at end of file
+        return combineVoltageWindows(minVCell, maxVCell)
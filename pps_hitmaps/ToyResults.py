@@ -0,0 +1,181 @@
+#############################################################################
+# zlib License
+#
+# (C) 2023 Cristóvão Beirão da Cruz e Silva <cbeiraod@cern.ch>
+#
+# This software is provided 'as-is', without any express or implied
+# warranty.  In no event will the authors be held liable for any damages
+# arising from the use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose,
+# including commercial applications, and to alter it and redistribute it
+# freely, subject to the following restrictions:
+#
+# 1. The origin of this software must not be misrepresented; you must not
+#    claim that you wrote the original software. If you use this software
+#    in a product, an acknowledgment in the product documentation would be
+#    appreciated but is not required.
+# 2. Altered source versions must be plainly marked as such, and must not be
+#    misrepresented as being the original software.
+# 3. This notice may not be removed or altered from any source distribution.
+#############################################################################
+
+
+from __future__ import annotations
+
+import numpy
+
+class ToyResults:
+    """
+    Compact storage of the toys thrown for a single shift position.
+    Only the event loss flags and the number of active pads, for the whole sensor (category "") and per pad category,
+    are stored, together with an optional (numToys, numPads) uint8 matrix of hits per pad, saturating at 255.
+    The remaining columns are derived on request; indexing by column name returns a pandas Series, so it can be used
+    in place of the dataframes previously returned by Sensor.simulateToys.
+    """
+    _parquetMetadataKey = b"pps_hitmaps.ToyResults"
+
+    def __init__(self, eventLoss: dict[str, numpy.ndarray], activePads: dict[str, numpy.ndarray], numPads: dict[str, int], hits: numpy.ndarray | None = None):
+        if set(eventLoss) != set(numPads) or set(activePads) != set(numPads):
+            raise ValueError("The event loss, active pads and number of pads must be given for the same categories")
+        if "" not in numPads:
+            raise ValueError("The results for the whole sensor must be given with the empty category")
+
+        numToys = len(activePads[""])
+        self.numPads = {cat: int(numPads[cat]) for cat in numPads}
+        padsType = numpy.min_scalar_type(max(self.numPads.values()))
+        self.eventLoss = {cat: numpy.asarray(eventLoss[cat], dtype=bool) for cat in numPads}
+        self.activePads = {cat: numpy.asarray(activePads[cat], dtype=padsType) for cat in numPads}
+        for cat in numPads:
+            if len(self.eventLoss[cat]) != numToys or len(self.activePads[cat]) != numToys:
+                raise ValueError("All categories must have the same number of toys")
+
+        if hits is not None:
+            hits = numpy.asarray(hits)
+            if hits.shape != (numToys, self.numPads[""]):
+                raise ValueError("The hits matrix must have shape (numToys, numPads)")
+            if hits.dtype != numpy.uint8:
+                hits = numpy.minimum(hits, 255).astype(numpy.uint8)
+        self.hits = hits
+
+    def __len__(self):
+        return len(self.activePads[""])
+
+    @property
+    def categories(self):
+        return [cat for cat in self.numPads if cat != ""]
+
+    @property
+    def nbytes(self):
+        size = sum(self.eventLoss[cat].nbytes + self.activePads[cat].nbytes for cat in self.numPads)
+        if self.hits is not None:
+            size += self.hits.nbytes
+        return size
+
+    @property
+    def columns(self):
+        columns = ['event']
+        if self.hits is not None:
+            columns += ['hitmap']
+        for cat in self.numPads:
+            suffix = "" if cat == "" else "_" + cat
+            columns += ['event_loss' + suffix, 'active_pads' + suffix, 'sensor_occupancy' + suffix, 'bit_length' + suffix]
+        return columns
+
+    def activeMask(self, packed: bool = False):
+        """Boolean (numToys, numPads) matrix of the pads with at least one hit, optionally bit-packed along the pads"""
+        if self.hits is None:
+            raise RuntimeError("The hits per pad were not stored for these toys")
+        mask = self.hits >= 1
+        if packed:
+            return numpy.packbits(mask, axis=1)
+        return mask
+
+    def hitmapStrings(self):
+        """The hits per pad of each toy as a comma separated string, as in the former 'hitmap' column"""
+        if self.hits is None:
+            raise RuntimeError("The hits per pad were not stored for these toys")
+        return [", ".join(row) for row in self.hits.astype(str).tolist()]
+
+    def column(self, name: str):
+        """Values of a column as a numpy array"""
+        if name == 'event':
+            return numpy.arange(len(self))
+        if name == 'hitmap':
+            return numpy.array(self.hitmapStrings(), dtype=object)
+
+        for quantity in ['event_loss', 'active_pads', 'sensor_occupancy', 'bit_length']:
+            if name == quantity:
+                cat = ""
+            elif name.startswith(quantity + "_") and name[len(quantity) + 1:] in self.numPads:
+                cat = name[len(quantity) + 1:]
+            else:
+                continue
+
+            if quantity == 'event_loss':
+                return self.eventLoss[cat]
+            activePads = self.activePads[cat].astype(numpy.int64)
+            if quantity == 'active_pads':
+                return activePads
+            if quantity == 'sensor_occupancy':
+                return activePads/self.numPads[cat]*100
+            return 40 * (activePads + 2)  # We add 2 because each event needs a header and a trailer and each data word is 40 bits
+
+        raise KeyError(name)
+
+    def __getitem__(self, name: str):
+        import pandas
+
+        return pandas.Series(self.column(name), name=name)
+
+    def toDataFrame(self, includeHitmap: bool = True):
+        """Expand into a dataframe with the same columns as the former Sensor.simulateToys output"""
+        import pandas
+
+        columns = [column for column in self.columns if includeHitmap or column != 'hitmap']
+        return pandas.DataFrame({column: self.column(column) for column in columns})
+
+    def toParquet(self, filename):
+        """Write the stored arrays to a Parquet file, requires pyarrow"""
+        import pyarrow
+        import pyarrow.parquet
+        import json
+
+        arrays = {}
+        for cat in self.numPads:
+            suffix = "" if cat == "" else "_" + cat
+            arrays['event_loss' + suffix] = pyarrow.array(self.eventLoss[cat])
+            arrays['active_pads' + suffix] = pyarrow.array(self.activePads[cat])
+        if self.hits is not None:
+            for padID in range(self.hits.shape[1]):
+                arrays[f'hits_{padID}'] = pyarrow.array(self.hits[:, padID])
+
+        table = pyarrow.table(arrays)
+        metadata = {"numPads": self.numPads, "hasHits": self.hits is not None}
+        table = table.replace_schema_metadata({self._parquetMetadataKey: json.dumps(metadata).encode()})
+        pyarrow.parquet.write_table(table, filename)
+
+    @classmethod
+    def fromParquet(cls, filename):
+        """Read toys written with toParquet"""
+        import pyarrow.parquet
+        import json
+
+        table = pyarrow.parquet.read_table(filename)
+        metadata = json.loads(table.schema.metadata[cls._parquetMetadataKey])
+        numPads = metadata["numPads"]
+
+        eventLoss = {}
+        activePads = {}
+        for cat in numPads:
+            suffix = "" if cat == "" else "_" + cat
+            eventLoss[cat] = table.column('event_loss' + suffix).to_numpy()
+            activePads[cat] = table.column('active_pads' + suffix).to_numpy()
+
+        hits = None
+        if metadata["hasHits"]:
+            hits = numpy.zeros((len(activePads[""]), numPads[""]), dtype=numpy.uint8)
+            for padID in range(numPads[""]):
+                hits[:, padID] = table.column(f'hits_{padID}').to_numpy()
+
+        return cls(eventLoss, activePads, numPads, hits)
@@ -24,15 +24,67 @@ __version__ = '0.0.2'
 
 from .PPSHitmap import PPSHitmap
 from .SensorPad import SensorPad
+from .PadLayout import PadColumn
+from .PadLayout import PadLayout
+from .PadLayout import PadTable
 from .Sensor import Sensor
 from .Sensor import calcLossProb
-from .CustomizedSensors import *
+from .ToyResults import ToyResults
+from .optimizers import optimizeShiftSchedule
+from .sweeps import sweepSensors
+from .exports import toTGraph
+from .exports import toTH2D
+from .exports import toTH2Poly
+from .exports import fillTH2
 
 from .functions import *
 
 __all__ = [
     "PPSHitmap",
     "SensorPad",
+    "PadColumn",
+    "PadLayout",
+    "PadTable",
     "Sensor",
     "calcLossProb",
+    "ToyResults",
+    "optimizeShiftSchedule",
+    "sweepSensors",
+    "toTGraph",
+    "toTH2D",
+    "toTH2Poly",
+    "fillTH2",
 ]
+
+# The customized sensors are only imported when one of them is first used, keep this list in sync with CustomizedSensors
+_customizedSensors = [
+    "SimpleETLSensor",
+    "RealisticETLSensor",
+    "PPSHybrid1Sensor",
+    "PPSHybrid2Sensor",
+    "PPSHybrid3Sensor",
+    "PPSHybrid4Sensor",
+    "PPSHybrid5Sensor",
+    "PPSHybrid6Sensor",
+    "PPSHybrid7Sensor",
+    "PPSHybrid8Sensor",
+    "PPSHybrid9Sensor",
+    "PPSHybrid10Sensor",
+    "PPSHybrid11Sensor",
+    "TIProduction1Sensor",
+    "TIProduction2Sensor",
+    "TIProduction3Sensor",
+    "RectangularPadSensor",
+    "RectangularPadSensorVertical",
+]
+
+def __getattr__(name):
+    if name in _customizedSensors:
+        from . import CustomizedSensors
+        value = getattr(CustomizedSensors, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_customizedSensors))
@@ -0,0 +1,149 @@
+#############################################################################
+# zlib License
+#
+# (C) 2023 Cristóvão Beirão da Cruz e Silva <cbeiraod@cern.ch>
+#
+# This software is provided 'as-is', without any express or implied
+# warranty.  In no event will the authors be held liable for any damages
+# arising from the use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose,
+# including commercial applications, and to alter it and redistribute it
+# freely, subject to the following restrictions:
+#
+# 1. The origin of this software must not be misrepresented; you must not
+#    claim that you wrote the original software. If you use this software
+#    in a product, an acknowledgment in the product documentation would be
+#    appreciated but is not required.
+# 2. Altered source versions must be plainly marked as such, and must not be
+#    misrepresented as being the original software.
+# 3. This notice may not be removed or altered from any source distribution.
+#############################################################################
+
+from __future__ import annotations
+
+# Minimum throughput of the hitmap text parser, a full 50 um map (~40 MB) should parse in under a second
+parseThroughputTarget = 50.0 # in MB/s
+
+# Maximum time for a fresh interpreter to import the package, so compute-only pool workers start fast
+importTimeBudget = 0.5 # in s
+
+# Modules which must only be loaded on first use, not when importing the package
+lazyModules = ["ROOT", "pandas", "hist", "matplotlib", "mplhep", "pps_hitmaps.CustomizedSensors"]
+
+def writeSyntheticHitmap(
+        filename: str,
+        xMin: float = 0.0, # in m
+        xMax: float = 0.042, # in m
+        xStep: float = 0.00005, # in m
+        yMin: float = -0.042, # in m
+        yMax: float = 0.042, # in m
+        yStep: float = 0.00005, # in m
+                         ):
+    """Write a hitmap text file in the same format as the simulation output, with a gaussian ridge as fluence"""
+    import numpy
+
+    xVals = numpy.round(xMin + numpy.arange(round((xMax - xMin)/xStep) + 1)*xStep, 6)
+    yVals = numpy.round(yMin + numpy.arange(round((yMax - yMin)/yStep) + 1)*yStep, 6)
+    x, y = numpy.meshgrid(xVals, yVals, indexing="ij")
+    fluence = 1.0E9*numpy.exp(-((x - 0.004)/0.003)**2 - ((y - 0.002 - 0.1*x)/0.004)**2) + 1.0E5
+
+    numpy.savetxt(filename, numpy.column_stack([x.ravel(), y.ravel(), fluence.ravel()]), fmt=["%.6g", "%.6g", "%.6e"])
+
+def benchmarkHitmapParser(
+        xStep: float = 0.00005, # in m
+        yStep: float = 0.00005, # in m
+        repeats: int = 3,
+        target: float | None = parseThroughputTarget,
+                          ):
+    """
+    Measure the throughput of the hitmap text parser on a synthetic full size map, bypassing the binary cache.
+    Returns the best throughput in MB/s, and raises a RuntimeError if it is below the target.
+    """
+    from .PPSHitmap import PPSHitmap
+    from pathlib import Path
+    from tempfile import TemporaryDirectory
+    import time
+
+    with TemporaryDirectory() as tmpDir:
+        filename = Path(tmpDir)/"synthetic_hitmap.out"
+        writeSyntheticHitmap(filename, xStep = xStep, yStep = yStep)
+        size = filename.stat().st_size/1.0E6 # in MB
+
+        bestTime = None
+        for _ in range(repeats):
+            hitmap = PPSHitmap(filename, "benchmark", 4.0, xStep = xStep, yStep = yStep, useCache = False)
+            start = time.perf_counter()
+            hitmap._checkMap()
+            elapsed = time.perf_counter() - start
+            if bestTime is None or elapsed < bestTime:
+                bestTime = elapsed
+
+    throughput = size/bestTime
+    if target is not None and throughput < target:
+        raise RuntimeError("The hitmap parser reached {:.1f} MB/s, below the target of {:.1f} MB/s".format(throughput, target))
+
+    return throughput
+
+def benchmarkImportTime(
+        repeats: int = 5,
+        budget: float | None = importTimeBudget,
+                        ):
+    """
+    Measure the time to import the package in a fresh interpreter, as a pool worker does when it starts.
+    Returns the best import time in s, and raises a RuntimeError if it is above the budget or if any of the lazy
+    modules was loaded by the import.
+    """
+    from pathlib import Path
+    import json
+    import subprocess
+    import sys
+
+    script = "\n".join([
+        "import json, sys, time",
+        "start = time.perf_counter()",
+        "import pps_hitmaps",
+        "elapsed = time.perf_counter() - start",
+        "print(json.dumps({'time': elapsed, 'loaded': [name for name in " + repr(lazyModules) + " if name in sys.modules]}))",
+    ])
+
+    bestTime = None
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True, check=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        if len(result["loaded"]) > 0:
+            raise RuntimeError("Importing pps_hitmaps loaded {}, which should only be loaded on first use".format(", ".join(result["loaded"])))
+        if bestTime is None or result["time"] < bestTime:
+            bestTime = result["time"]
+
+    if budget is not None and bestTime > budget:
+        raise RuntimeError("Importing pps_hitmaps took {:.3f} s, above the budget of {:.3f} s".format(bestTime, budget))
+
+    return bestTime
+
+def main():
+    """
+    Run the benchmarks against their targets, as python -m pps_hitmaps.benchmarks
+    Returns 0 if all of them pass and 1 otherwise, so it can be used as a check.
+    """
+    benchmarks = [
+        ("import time", benchmarkImportTime, "{:.3f} s"),
+        ("hitmap parser", benchmarkHitmapParser, "{:.1f} MB/s"),
+    ]
+
+    failed = False
+    for name, benchmark, unit in benchmarks:
+        try:
+            result = benchmark()
+        except Exception as e:
+            print("FAIL {}: {}".format(name, e))
+            failed = True
+        else:
+            print("PASS {}: {}".format(name, unit.format(result)))
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
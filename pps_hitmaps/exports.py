@@ -0,0 +1,100 @@
+#############################################################################
+# zlib License
+#
+# (C) 2023 Cristóvão Beirão da Cruz e Silva <cbeiraod@cern.ch>
+#
+# This software is provided 'as-is', without any express or implied
+# warranty.  In no event will the authors be held liable for any damages
+# arising from the use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose,
+# including commercial applications, and to alter it and redistribute it
+# freely, subject to the following restrictions:
+#
+# 1. The origin of this software must not be misrepresented; you must not
+#    claim that you wrote the original software. If you use this software
+#    in a product, an acknowledgment in the product documentation would be
+#    appreciated but is not required.
+# 2. Altered source versions must be plainly marked as such, and must not be
+#    misrepresented as being the original software.
+# 3. This notice may not be removed or altered from any source distribution.
+#############################################################################
+
+
+from __future__ import annotations
+
+import numpy
+
+def toTGraph(x, y, name: str | None = None, title: str | None = None):
+    """Build a ROOT TGraph from arrays of x and y values"""
+    from ROOT import TGraph  # type: ignore
+    from array import array
+
+    xArr = array('d', numpy.asarray(x, dtype=numpy.float64).tolist())
+    yArr = array('d', numpy.asarray(y, dtype=numpy.float64).tolist())
+    if len(xArr) != len(yArr):
+        raise ValueError("The x and y arrays of a graph must have the same length")
+
+    graph = TGraph(len(xArr), xArr, yArr)
+    if name is not None:
+        graph.SetName(name)
+    if title is not None:
+        graph.SetTitle(title)
+
+    return graph
+
+def toTH2D(name: str, title: str, edgesX, edgesY, values = None):
+    """
+    Build a ROOT TH2D with variable bins from the bin edges along x and y, optionally filled with the values of an
+    array of shape (numBinsX, numBinsY).
+    """
+    from ROOT import TH2D  # type: ignore
+    from array import array
+
+    xArr = array('d', numpy.asarray(edgesX, dtype=numpy.float64).tolist())
+    yArr = array('d', numpy.asarray(edgesY, dtype=numpy.float64).tolist())
+
+    hist = TH2D(name, title, len(xArr)-1, xArr, len(yArr)-1, yArr)
+
+    if values is not None:
+        fillTH2(hist, values)
+
+    return hist
+
+def fillTH2(hist, values):
+    """
+    Set the contents of all the bins of a ROOT 2D histogram in a single call, from an array of shape
+    (numBinsX, numBinsY). The underflow and overflow bins are left empty.
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    numBinsX = hist.GetNbinsX()
+    numBinsY = hist.GetNbinsY()
+    if values.shape != (numBinsX, numBinsY):
+        raise ValueError("The values must have shape (numBinsX, numBinsY)")
+
+    # ROOT stores the bins with x running fastest and includes the underflow and overflow bins of each axis
+    content = numpy.zeros((numBinsY + 2, numBinsX + 2), dtype=numpy.float64)
+    content[1:-1, 1:-1] = values.T
+    hist.SetContent(numpy.ascontiguousarray(content).ravel())
+
+    return hist
+
+def toTH2Poly(name: str, title: str, minX, maxX, minY, maxY, limits: tuple, values = None):
+    """
+    Build a ROOT TH2Poly with one rectangular bin per pad, from the arrays of pad rectangles, with the axes covering
+    limits = (minX, maxX, minY, maxY). The bins are optionally filled with the values of an array of shape (numPads,).
+    """
+    from ROOT import TH2Poly  # type: ignore
+    from array import array
+
+    hist = TH2Poly(name, title, *limits)
+    for padMinX, padMaxX, padMinY, padMaxY in zip(*[numpy.asarray(edges, dtype=numpy.float64).tolist() for edges in [minX, maxX, minY, maxY]]):
+        xVals = array('d', [padMinX, padMinX, padMaxX, padMaxX])
+        yVals = array('d', [padMinY, padMaxY, padMaxY, padMinY])
+        hist.AddBin(4, xVals, yVals)
+
+    if values is not None:
+        for padID, value in enumerate(numpy.asarray(values, dtype=numpy.float64).tolist()):
+            hist.SetBinContent(padID + 1, value)
+
+    return hist
@@ -1,46 +1,70 @@
 from __future__ import annotations
 
-import ROOT
-from math import exp
-
 def calcEventLossProb(
-        timeStep: float,
-        occupancy: float,
+        timeStep,
+        occupancy,
                       ):
-    return 1 - (occupancy ** 2)/((1 - exp(-occupancy))**2) * exp(-2*occupancy * (timeStep + 1))
+    """
+    Event loss probability for a pad with the given occupancy (mean hits per bunch crossing) and a deadtime of
+    timeStep bunch crossings. Both arguments broadcast as numpy arrays, a null occupancy has no event loss.
+    """
+    import numpy
+
+    timeStep = numpy.asarray(timeStep, dtype=numpy.float64)
+    occupancy = numpy.asarray(occupancy, dtype=numpy.float64)
+
+    # occupancy/(1 - exp(-occupancy)), which tends to 1 for a null occupancy
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ratio = numpy.where(occupancy == 0, 1.0, occupancy/(-numpy.expm1(-occupancy)))
+
+    result = 1 - ratio**2 * numpy.exp(-2*occupancy * (timeStep + 1))
+    if result.ndim == 0:
+        return float(result)
+    return result
 
 def eventLossProbDistrib(
-        timeStep: float,
-        occupancy: list[float],
+        timeStep,
+        occupancy,
                          ):
-    lossProb = []
+    """Event loss probability for each of the occupancies, as an array"""
+    return calcEventLossProb(timeStep, occupancy)
 
-    for val in occupancy:
-        lossProb += [calcEventLossProb(timeStep, val)]
-
-    return lossProb
+class _EventLossProbabilities(dict):
+    # Resolves the former 'prob_timeStep<N>' keys to columns of the probability array
+    def __missing__(self, key):
+        if isinstance(key, str) and key.startswith("prob_timeStep"):
+            timeStep = int(key[len("prob_timeStep"):])
+            if len(self['time_steps']) > 0:
+                column = timeStep - self['time_steps'][0]
+                if 0 <= column < len(self['time_steps']):
+                    return self['probability'][:, column]
+        raise KeyError(key)
 
 def occupancyToEventLossProbability(
-        occupancy: list[float],
+        occupancy,
         minTimeStep: int = 0,
         maxTimeStep: int = 400,
                                          ):
-    allTimeSteps = range(minTimeStep, maxTimeStep)
+    """
+    Event loss probability for each occupancy and each time step from minTimeStep to maxTimeStep (excluded).
+    The 'probability' entry is an array of shape (len(occupancy), numTimeSteps), the former 'prob_timeStep<N>' keys
+    are still accepted and return the matching column.
+    """
+    import numpy
+
+    allTimeSteps = numpy.arange(minTimeStep, maxTimeStep)
+    occupancy = numpy.asarray(occupancy, dtype=numpy.float64)
 
-    retData = {
+    retData = _EventLossProbabilities({
         'time_steps': allTimeSteps,
         'occupancy': occupancy,
-    }
-
-    for timeStep in allTimeSteps:
-        probability = eventLossProbDistrib(timeStep, occupancy)
-
-        retData["prob_timeStep{}".format(timeStep)] = probability
+        'probability': calcEventLossProb(allTimeSteps[None, :], occupancy[:, None]),
+    })
 
     return retData
 
 def occupancyGraphToEventLossProbability(
-        occupancyGraph: ROOT.TGraph,
+        occupancyGraph: "ROOT.TGraph",
         minTimeStep: int = 0,
         maxTimeStep: int = 400,
                                          ):
@@ -0,0 +1,188 @@
+#############################################################################
+# zlib License
+#
+# (C) 2023 Cristóvão Beirão da Cruz e Silva <cbeiraod@cern.ch>
+#
+# This software is provided 'as-is', without any express or implied
+# warranty.  In no event will the authors be held liable for any damages
+# arising from the use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose,
+# including commercial applications, and to alter it and redistribute it
+# freely, subject to the following restrictions:
+#
+# 1. The origin of this software must not be misrepresented; you must not
+#    claim that you wrote the original software. If you use this software
+#    in a product, an acknowledgment in the product documentation would be
+#    appreciated but is not required.
+# 2. Altered source versions must be plainly marked as such, and must not be
+#    misrepresented as being the original software.
+# 3. This notice may not be removed or altered from any source distribution.
+#############################################################################
+
+
+from __future__ import annotations
+
+import numpy
+
+from .PPSHitmap import PPSHitmap
+from .SensorPad import calculatePadFluxes
+
+def _scenarioPadQuantities(sensor, hitmap: PPSHitmap, yPositions, xPosition: float | None = None, usePadSpacing: bool = True):
+    """
+    Mean fluence (per fb-1) and occupancy of every pad with the sensor centered at each of the y positions (in mm).
+    Returns two arrays of shape (numPads, numPositions).
+    """
+    hitmap._checkMap()
+
+    geometry = sensor.padGeometry()
+    suffix = "" if usePadSpacing else "_extra"
+    minX, maxX = geometry["minX" + suffix], geometry["maxX" + suffix]
+    minY, maxY = geometry["minY" + suffix], geometry["maxY" + suffix]
+
+    if xPosition is None:
+        xPosition = hitmap.detectorEdge*1000 + (sensor.maxX - sensor.minX)/2
+    shifts = numpy.column_stack([numpy.full(len(yPositions), xPosition), yPositions])
+
+    fluxes = calculatePadFluxes(hitmap, minX, maxX, minY, maxY, shifts)
+    binArea = hitmap.xStep * hitmap.yStep * 1000 * 1000 # in mm^2
+    meanFlux = fluxes['totalFlux'] * binArea / ((maxX - minX) * (maxY - minY))[:, None]
+
+    return meanFlux, fluxes['occupancy']
+
+def optimizeShiftSchedule(
+        sensor,
+        hitmaps: PPSHitmap | list[PPSHitmap],
+        maxShifts: int,
+        stepGranularity: float, # in mm
+        motorRange: tuple[float, float], # in mm
+        objective: str = "dose",
+        minShifts: int = 0,
+        maxTravel: float | None = None, # in mm
+        xPosition: float | None = None, # in mm
+        usePadSpacing: bool = True,
+        integratedLuminosity: float = 300, # in fb-1
+        numCandidates: int = 10,
+                          ):
+    """
+    Search the vertical shift schedule of a sensor that minimises the peak end of life dose ("dose") or the peak
+    occupancy ("occupancy") over all pads, taking the worst case over a set of scenario hitmaps.
+
+    A schedule is a set of numShifts+1 equally spaced positions of the sensor center, with the integrated luminosity
+    split evenly between them, as built by computeShifts in the notebooks. All positions are on a grid with spacing
+    stepGranularity inside motorRange, the step is a multiple of stepGranularity and the total travel can be limited
+    with maxTravel. The sensor is placed at xPosition, by default next to the detector edge of each hitmap.
+
+    The pad fluences for all grid positions are computed once with the summed-area table backend, so every schedule
+    is scored exhaustively. For the dose this score is the pad averaged fluence, the numCandidates best schedules by
+    this score are then ranked by their end of life dose at the hottest point, from Sensor.maxDoseEOL on a copy of
+    the sensor. Ties are broken by fewer shifts and then by a shorter travel.
+
+    Returns a dictionary with the yPositions of the best schedule, numShifts, step, peakDose (the end of life dose at
+    the hottest point, in p/cm^2), peakMeanDose (the same for the pad averaged fluence) and peakOccupancy, and the
+    objective value as peak.
+    """
+    if objective not in ["dose", "occupancy"]:
+        raise ValueError("Unknown objective for the shift schedule: {}".format(objective))
+    if stepGranularity <= 0:
+        raise ValueError("The step granularity must be positive")
+    if minShifts < 0 or maxShifts < minShifts:
+        raise ValueError("The number of shifts must satisfy 0 <= minShifts <= maxShifts")
+    if numCandidates < 1:
+        raise ValueError("At least one candidate schedule must be kept")
+    import copy
+
+    if isinstance(hitmaps, PPSHitmap):
+        hitmaps = [hitmaps]
+
+    motorMin, motorMax = min(motorRange), max(motorRange)
+    yPositions = numpy.round(motorMin + numpy.arange(int(numpy.floor((motorMax - motorMin)/stepGranularity + 1.0E-9)) + 1)*stepGranularity, 6)
+    numPositions = len(yPositions)
+
+    # Arrays of shape (numScenarios, numPads, numPositions)
+    meanFlux = []
+    occupancy = []
+    for hitmap in hitmaps:
+        scenarioFlux, scenarioOccupancy = _scenarioPadQuantities(sensor, hitmap, yPositions, xPosition=xPosition, usePadSpacing=usePadSpacing)
+        meanFlux += [scenarioFlux]
+        occupancy += [scenarioOccupancy]
+    meanFlux = numpy.stack(meanFlux)
+    occupancy = numpy.stack(occupancy)
+    peakOccupancy = occupancy.max(axis=(0, 1)) # The occupancy only needs the hottest pad at each position
+
+    maxSteps = numPositions - 1
+    if maxTravel is not None:
+        maxSteps = min(maxSteps, int(numpy.floor(maxTravel/stepGranularity + 1.0E-9)))
+
+    # The best schedules by the score, as (score, numShifts, travel, first position, step)
+    keep = numCandidates if objective == "dose" else 1
+    candidates = []
+    def consider(values, numShifts, stepIdx):
+        nonlocal candidates
+        firsts = numpy.argsort(values, kind="stable")[:keep]
+        candidates += [(float(values[first]), numShifts, numShifts*stepIdx, int(first), stepIdx) for first in firsts]
+        if len(candidates) > 4*keep:
+            candidates = sorted(candidates)[:keep]
+
+    if minShifts == 0:
+        if objective == "dose":
+            consider(meanFlux.max(axis=(0, 1)), 0, 0)
+        else:
+            consider(peakOccupancy, 0, 0)
+
+    for stepIdx in range(1, maxSteps + 1):
+        # Running sum (or max) over the positions first, first + stepIdx, ..., first + numShifts*stepIdx
+        summedFlux = meanFlux
+        maxOccupancy = peakOccupancy
+        for numShifts in range(1, maxShifts + 1):
+            offset = numShifts*stepIdx
+            if offset > maxSteps:
+                break
+            if objective == "dose":
+                summedFlux = summedFlux[..., :numPositions - offset] + meanFlux[..., offset:]
+                if numShifts >= minShifts:
+                    consider(summedFlux.max(axis=(0, 1))/(numShifts + 1), numShifts, stepIdx)
+            else:
+                maxOccupancy = numpy.maximum(maxOccupancy[:numPositions - offset], peakOccupancy[offset:])
+                if numShifts >= minShifts:
+                    consider(maxOccupancy, numShifts, stepIdx)
+
+    if len(candidates) == 0:
+        raise RuntimeError("No shift schedule satisfies the constraints")
+    candidates = sorted(candidates)[:keep]
+
+    # End of life dose at the hottest point, worst case over the scenarios
+    trialSensor = copy.deepcopy(sensor)
+    def peakDoseEOL(indices):
+        peak = None
+        for hitmap in hitmaps:
+            x = xPosition if xPosition is not None else hitmap.detectorEdge*1000 + (sensor.maxX - sensor.minX)/2
+            trialSensor.setShifts([(x, float(y)) for y in yPositions[indices]])
+            trialSensor.calculateFlux(hitmap)
+            dose = trialSensor.maxDoseEOL(integratedLuminosity=integratedLuminosity, usePadSpacing=usePadSpacing)
+            if peak is None or dose > peak:
+                peak = dose
+        return peak
+
+    best = None
+    for _, numShifts, travel, first, stepIdx in candidates:
+        indices = first + numpy.arange(numShifts + 1)*stepIdx
+        peakDose = peakDoseEOL(indices)
+        key = (peakDose if objective == "dose" else 0, numShifts, travel, first)
+        if best is None or key < best[0]:
+            best = (key, numShifts, stepIdx, indices, peakDose)
+
+    _, numShifts, stepIdx, indices, peakDose = best
+    peakMeanDose = float(meanFlux[..., indices].mean(axis=-1).max()) * integratedLuminosity
+    scheduleOccupancy = float(peakOccupancy[indices].max())
+
+    return {
+        'objective': objective,
+        'yPositions': yPositions[indices].tolist(),
+        'numShifts': numShifts,
+        'step': round(stepIdx*stepGranularity, 6),
+        'peakDose': peakDose,
+        'peakMeanDose': peakMeanDose,
+        'peakOccupancy': scheduleOccupancy,
+        'peak': peakDose if objective == "dose" else scheduleOccupancy,
+    }
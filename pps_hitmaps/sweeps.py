@@ -0,0 +1,184 @@
+#############################################################################
+# zlib License
+#
+# (C) 2023 Cristóvão Beirão da Cruz e Silva <cbeiraod@cern.ch>
+#
+# This software is provided 'as-is', without any express or implied
+# warranty.  In no event will the authors be held liable for any damages
+# arising from the use of this software.
+#
+# Permission is granted to anyone to use this software for any purpose,
+# including commercial applications, and to alter it and redistribute it
+# freely, subject to the following restrictions:
+#
+# 1. The origin of this software must not be misrepresented; you must not
+#    claim that you wrote the original software. If you use this software
+#    in a product, an acknowledgment in the product documentation would be
+#    appreciated but is not required.
+# 2. Altered source versions must be plainly marked as such, and must not be
+#    misrepresented as being the original software.
+# 3. This notice may not be removed or altered from any source distribution.
+#############################################################################
+
+
+from __future__ import annotations
+
+import numpy
+
+from .PPSHitmap import PPSHitmap
+
+# Hitmaps of the sweep, sent once to each worker process
+_workerHitmaps = {}
+
+def _initSweepWorker(hitmaps: dict):
+    global _workerHitmaps
+    _workerHitmaps = hitmaps
+
+def _hitmapSignature(hitmap: PPSHitmap):
+    """Identification of a hitmap for the sweep cache, any change to the source file invalidates it"""
+    from pathlib import Path
+    import os
+
+    stat = os.stat(hitmap.filename)
+    return [str(Path(hitmap.filename).resolve()), stat.st_size, stat.st_mtime_ns,
+            hitmap.xMin, hitmap.xMax, hitmap.xStep, hitmap.yMin, hitmap.yMax, hitmap.yStep,
+            hitmap.addBackgroundFlux, hitmap.detectorEdge]
+
+def evaluateSensor(sensor, hitmap: PPSHitmap, integratedLuminosity: float = 300, usePadSpacing: bool = True, deadtime: float = 0, bunchSpacing: float = 25., crossingRate: float | None = None):
+    """
+    Figures of merit of a sensor at its current shifts, taking the worst shift position:
+      - maxOccupancy: occupancy of the hottest pad
+      - eventLoss: event loss probability for the deadtime (in ns), and eventLoss_<category> per pad category
+      - maxDoseEOL: highest end of life dose in any pad, in p/cm^2
+      - bitLength: mean number of bits per event, with a header and a trailer word
+      - dataRate: bitLength times the crossingRate, in bit/s. By default the crossing rate is 1/bunchSpacing, i.e. every
+                  bunch slot is filled, which is an upper bound (the LHC averages about 31.6 MHz with 2808 bunches)
+    """
+    sensor.calculateFlux(hitmap)
+
+    occupancy = sensor.fluxArrays["occupancy" if usePadSpacing else "occupancy_extra"]
+    eventLoss = sensor.eventLossProbability(deadtime, bunchSpacing=bunchSpacing)
+
+    # Mean bit length of the events, a 40 bit word per pad with hits plus a header and a trailer word
+    padActive = -numpy.expm1(-sensor.fluxArrays["occupancy"])
+    bitLength = float((40*(padActive.sum(axis=0) + 2)).max())
+
+    result = {
+        'maxOccupancy': float(occupancy.max()) if occupancy.size > 0 else 0.0,
+        'eventLoss': float(eventLoss[""].max()),
+    }
+    for cat in eventLoss:
+        if cat != "":
+            result['eventLoss_' + cat] = float(eventLoss[cat].max())
+    result['maxDoseEOL'] = sensor.maxDoseEOL(integratedLuminosity=integratedLuminosity, usePadSpacing=usePadSpacing)
+    result['bitLength'] = bitLength
+    if crossingRate is None:
+        crossingRate = 1.0E9/bunchSpacing
+    result['dataRate'] = bitLength * crossingRate
+
+    return result
+
+def _evaluateCombination(sensorClass, parameters: dict, hitmap: PPSHitmap | str, positions: list, settings: dict):
+    if isinstance(hitmap, str):
+        hitmap = _workerHitmaps[hitmap]
+    sensor = sensorClass(shifts = positions, **parameters)
+    return evaluateSensor(sensor, hitmap, **settings)
+
+def sweepSensors(
+        sensorClass,
+        parameterGrid: dict[str, list],
+        hitmaps: PPSHitmap | dict[str, PPSHitmap],
+        positions: list[tuple[float, float]] | dict[str, list[tuple[float, float]]],
+        numWorkers: int | None = None,
+        cacheDir: str | None = None,
+        integratedLuminosity: float = 300, # in fb-1
+        usePadSpacing: bool = True,
+        deadtime: float = 0, # in ns
+        bunchSpacing: float = 25., # in ns
+        crossingRate: float | None = None, # in Hz
+                 ):
+    """
+    Evaluate a sensor layout class (e.g. RectangularPadSensor) for every combination of the constructor parameters in
+    parameterGrid (e.g. {"PadSize": [1.0, 1.3], "NumSmallerCols": [2, 3]}) and every hitmap, with the given shift
+    positions, or a dictionary of positions per hitmap name. See evaluateSensor for the figures of merit.
+
+    The combinations are spread over numWorkers processes, each receiving the hitmaps once. With cacheDir, the result of
+    each combination is stored as a small json file, keyed on the layout, parameters, hitmap file, positions and
+    settings, and reused by later sweeps.
+
+    Returns a pandas DataFrame with one row per combination and hitmap.
+    """
+    from itertools import product
+    from pathlib import Path
+    import hashlib
+    import json
+    import os
+    import pandas
+    import tempfile
+
+    if isinstance(hitmaps, PPSHitmap):
+        hitmaps = {"hitmap": hitmaps}
+    if not isinstance(positions, dict):
+        positions = {name: positions for name in hitmaps}
+    positions = {name: [(float(x), float(y)) for x, y in positions[name]] for name in hitmaps}
+
+    settings = {
+        'integratedLuminosity': integratedLuminosity,
+        'usePadSpacing': usePadSpacing,
+        'deadtime': deadtime,
+        'bunchSpacing': bunchSpacing,
+        'crossingRate': crossingRate,
+    }
+
+    parameterNames = list(parameterGrid)
+    combinations = [dict(zip(parameterNames, values)) for values in product(*[parameterGrid[name] for name in parameterNames])]
+    tasks = [(parameters, name) for parameters in combinations for name in hitmaps]
+
+    results = [None]*len(tasks)
+    cacheFiles = [None]*len(tasks)
+    if cacheDir is not None:
+        cacheDir = Path(cacheDir)
+        signatures = {name: _hitmapSignature(hitmaps[name]) for name in hitmaps}
+        for taskIdx, (parameters, name) in enumerate(tasks):
+            key = json.dumps({
+                'sensor': "{}.{}".format(sensorClass.__module__, sensorClass.__qualname__),
+                'parameters': parameters,
+                'hitmap': signatures[name],
+                'positions': positions[name],
+                'settings': settings,
+            }, sort_keys=True, default=str)
+            cacheFiles[taskIdx] = cacheDir/"{}.json".format(hashlib.blake2b(key.encode(), digest_size=16).hexdigest())
+            try:
+                with open(cacheFiles[taskIdx]) as file:
+                    results[taskIdx] = json.load(file)
+            except (OSError, ValueError):
+                pass
+
+    pending = [taskIdx for taskIdx in range(len(tasks)) if results[taskIdx] is None]
+    if numWorkers is None or numWorkers <= 1:
+        computed = [_evaluateCombination(sensorClass, tasks[taskIdx][0], hitmaps[tasks[taskIdx][1]], positions[tasks[taskIdx][1]], settings) for taskIdx in pending]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers = numWorkers, initializer = _initSweepWorker, initargs = (hitmaps,)) as executor:
+            computed = list(executor.map(_evaluateCombination,
+                                         [sensorClass]*len(pending),
+                                         [tasks[taskIdx][0] for taskIdx in pending],
+                                         [tasks[taskIdx][1] for taskIdx in pending],
+                                         [positions[tasks[taskIdx][1]] for taskIdx in pending],
+                                         [settings]*len(pending)))
+
+    for taskIdx, result in zip(pending, computed):
+        results[taskIdx] = result
+        if cacheFiles[taskIdx] is not None:
+            try:
+                cacheDir.mkdir(parents=True, exist_ok=True)
+                # Unique temporary file, so concurrent sweeps sharing the cache never write to the same file
+                with tempfile.NamedTemporaryFile("w", dir=cacheDir, prefix=cacheFiles[taskIdx].name + ".", suffix=".tmp", delete=False) as file:
+                    json.dump(result, file)
+                os.replace(file.name, cacheFiles[taskIdx])
+            except OSError:
+                # The cache is only an optimisation
+                pass
+
+    rows = [{**parameters, 'hitmap': name, **result} for (parameters, name), result in zip(tasks, results)]
+    return pandas.DataFrame(rows)